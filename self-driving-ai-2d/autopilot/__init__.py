@@ -1,4 +1,10 @@
-from autopilot.highway import Highway
-from autopilot.car import Car
+from autopilot.highway import Highway, HighwayStack
+from autopilot.car import CarFleet, Car
+from autopilot.mapbank import MapBank
 from autopilot.simulation import Simulation
-__all__ = "Highway", "Car", "Simulation"
+from autopilot.env import VecEnv, SubprocVecEnv
+from autopilot.recorder import TrajectoryRecorder, Replay
+__all__ = (
+    "Highway", "HighwayStack", "CarFleet", "Car", "MapBank",
+    "Simulation", "VecEnv", "SubprocVecEnv", "TrajectoryRecorder", "Replay"
+)
@@ -0,0 +1,56 @@
+import pygame as pg
+from collections import OrderedDict
+
+__all__ = "SpriteAtlas", "car_sprites"
+
+
+class SpriteAtlas:
+    """Sprites loaded once, scaled once per scale and rotated lazily with a bounded cache of rotated variants"""
+
+    def __init__(self, path, count, angle_step=1, max_rotated=2048):
+        self.path = path
+        self.count = count
+        self.angle_step = angle_step
+        self.max_rotated = max_rotated
+        self.images = []
+        self.scaled = {}
+        self.rotated = OrderedDict()
+
+    def __len__(self):
+        return self.count
+
+    def _load(self):
+        """Loads all sprites from disk"""
+        self.images = [pg.image.load(self.path.format(i)) for i in range(self.count)]
+
+    @staticmethod
+    def _convert(sprite):
+        """Converts sprite to the display pixel format for fast blitting when the display mode is set"""
+        return sprite.convert_alpha() if pg.display.get_surface() else sprite
+
+    def get(self, index, scale=1):
+        """Returns the sprite scaled to the given scale"""
+        if scale not in self.scaled:
+            if not self.images:
+                self._load()
+            self.scaled[scale] = [
+                self._convert(pg.transform.scale(image, (round(image.get_width() * scale),
+                                                         round(image.get_height() * scale))))
+                for image in self.images
+            ]
+        return self.scaled[scale][index]
+
+    def get_rotated(self, index, scale, angle):
+        """Returns the scaled sprite rotated by the angle rounded to the angle step"""
+        angle = round(angle / self.angle_step) * self.angle_step % 360
+        key = index, scale, angle
+        if key in self.rotated:
+            self.rotated.move_to_end(key)
+        else:
+            self.rotated[key] = pg.transform.rotate(self.get(index, scale), angle)
+            if len(self.rotated) > self.max_rotated:
+                self.rotated.popitem(last=False)
+        return self.rotated[key]
+
+
+car_sprites = SpriteAtlas("autopilot/sprites/car{}.png", 64)
@@ -1,30 +1,36 @@
 import numpy as np
 import pygame as pg
-from random import randint
+from random import Random
 from pygame.math import Vector2
-from math import sqrt, sin, cos, radians, degrees, copysign
+from autopilot.radars import Radars
+from autopilot.atlas import car_sprites
+from autopilot.labels import labels
+from autopilot.profiler import NullProfiler
 
-__all__ = "Car"
+__all__ = "CarFleet", "Car"
 
+# sprites are chosen apart from the global random state shared with NEAT evolution
+_sprites_random = Random()
 
-class Car:
-    """Kinematic model of a car with radars for calculating distances to objects"""
 
-    def __init__(self, spawn_position=(0.0, 0.0), spawn_angle=0, scale=1,
-                 show_collision=False, show_radars=False, show_score=False):
-        sprite = pg.image.load(f"autopilot/sprites/car{randint(0, 63)}.png")
-        rect = sprite.get_rect()
-        w, h = round(rect.width * scale), round(rect.height * scale)
-        self.car_sprite = pg.transform.scale(sprite, (w, h))
+class CarFleet:
+    """Kinematic model of a fleet of cars stored as arrays and advanced by a single vectorized step"""
+    profiler = NullProfiler()
+
+    def __init__(self, size, spawn_position=(0.0, 0.0), spawn_angle=0, scale=1, radars=None,
+                 stall_window=None, stall_progress=5.0, progress_window=16, maps=None):
+        w, h = car_sprites.get(0, scale).get_size()
         self.car_sprite_width = 0.5 * w - 5
         self.car_sprite_height = 0.5 * h - 10
         self.chassis_length = 0.03 * h
 
-        self.angle = spawn_angle
-        self.position = Vector2(*spawn_position)
-        self.velocity = Vector2(0.0, 0.0)
-        self.acceleration = 0.0
-        self.steering = 0.0
+        self.size = size
+        self.maps = np.zeros(size, np.int_) if maps is None else np.asarray(maps, np.int_)
+        self.angle = np.full(size, spawn_angle, np.float64)
+        self.position = np.array(np.broadcast_to(np.asarray(spawn_position, np.float64), (size, 2)))
+        self.velocity = np.zeros(size, np.float64)
+        self.acceleration = np.zeros(size, np.float64)
+        self.steering = np.zeros(size, np.float64)
 
         self.brake_deceleration = 10.0 * scale
         self.free_deceleration = 2.0 * scale
@@ -34,172 +40,289 @@ class Car:
         self.max_steering = 1.5 * scale
         self.max_radar_len = int(300 * scale)
 
-        self.is_alive = True
-        self.radars_data = np.zeros(5, np.int_)
+        self.radars_engine = radars if radars else Radars(count=5)
+        self.is_alive = np.ones(size, np.bool_)
+        self.radars = np.zeros((size, self.radars_engine.count, 2), np.int_)
+        self.radars_data = np.zeros((size, self.radars_engine.count), np.single)
+        self.collision_points = np.zeros((size, 4, 2), np.int_)
         self.scale = scale
-        self.score = 0
+        self.score = np.zeros(size, np.float64)
 
-        self.show_collision_points = show_collision
-        self.show_radars = show_radars
-        self.show_score = show_score
+        self.curve_index = np.full(size, -1, np.int_)
+        self.progress = np.zeros(size, np.float64)
+        self.progress_mark = np.zeros(size, np.float64)
+        self.progress_window = progress_window
+        self.stall_time = np.zeros(size, np.int_)
+        self.stall_window = stall_window
+        self.stall_progress = stall_progress
+
+        self._compute_collision_points(np.arange(size))
+
+    def __len__(self):
+        return self.size
+
+    def _update(self, idx, actions, dt):
+        """Updates motion parameters according to the kinematics laws and the input directions of the cars"""
+        direction, rotation = actions[:, 0], actions[:, 1]
+        velocity, acceleration, steering = self.velocity[idx], self.acceleration[idx], self.steering[idx]
 
-    def _update(self, movement, dt):
-        """Updates motion parameters according to the kinematics laws and the input direction of the car"""
         # update acceleration
-        if movement["direction"] in {1, "forward"}:
-            if self.velocity.x < 0:
-                self.acceleration = self.brake_deceleration
-            else:
-                self.acceleration += dt
-        elif movement["direction"] in {-1, "backward"}:
-            if self.velocity.x > 0:
-                self.acceleration = -self.brake_deceleration
-            else:
-                self.acceleration -= dt
-        elif movement["direction"] in {0, "neutral"}:
-            if abs(self.velocity.x) > dt * self.free_deceleration:
-                self.acceleration = -copysign(self.free_deceleration, self.velocity.x)
-            elif dt:
-                self.acceleration = -self.velocity.x / dt
+        forward, backward, neutral = direction == 1, direction == -1, direction == 0
+        acceleration = np.where(forward & (velocity < 0), self.brake_deceleration, acceleration)
+        acceleration = np.where(forward & (velocity >= 0), acceleration + dt, acceleration)
+        acceleration = np.where(backward & (velocity > 0), -self.brake_deceleration, acceleration)
+        acceleration = np.where(backward & (velocity <= 0), acceleration - dt, acceleration)
+        rolling = neutral & (np.abs(velocity) > dt * self.free_deceleration)
+        acceleration = np.where(rolling, -np.copysign(self.free_deceleration, velocity), acceleration)
+        if dt:
+            acceleration = np.where(neutral & ~rolling, -velocity / dt, acceleration)
 
         # update steering
-        if movement["rotation"] in {1, "right"}:
-            self.steering -= self.max_steering * dt
-        elif movement["rotation"] in {-1, "left"}:
-            self.steering += self.max_steering * dt
-        elif movement["rotation"] in {0, "neutral"}:
-            self.steering = 0
+        steering = np.where(rotation == 1, steering - self.max_steering * dt, steering)
+        steering = np.where(rotation == -1, steering + self.max_steering * dt, steering)
+        steering = np.where(rotation == 0, 0.0, steering)
 
         # update velocity
-        self.velocity.x += self.acceleration * dt
-        self._check_params()
+        velocity = velocity + acceleration * dt
+        velocity, acceleration, steering = self._check_params(velocity, acceleration, steering)
 
         # update position and angle
-        if self.steering:
-            turning_radius = self.chassis_length / sin(radians(self.steering))
-            angular_velocity = self.velocity.x / turning_radius
-        else:
-            angular_velocity = 0
-
-        self.position += self.velocity.rotate(-self.angle) * dt
-        self.angle += degrees(angular_velocity) * dt
-
-    def _check_params(self):
-        """Checks if params are out of maximum ranges"""
-        self.velocity.x = max(-self.max_velocity, min(self.velocity.x, self.max_velocity))
-        self.acceleration = max(-self.max_acceleration, min(self.acceleration, self.max_acceleration))
-        self.steering = max(-self.max_steering, min(self.steering, self.max_steering))
-
-    def _stop(self):
-        """Stops a car model"""
-        self.is_alive = False
-        self.acceleration = 0
-        self.velocity.x = 0
-        self.steering = 0
-
-    def _compute_collision_points(self):
-        """Calculates collision points along the sides of the car"""
-        sin_alpha = sin(radians(-self.angle))
-        cos_alpha = cos(radians(-self.angle))
-
-        left, right = self.position.x - self.car_sprite_width, self.position.x + self.car_sprite_width
-        bottom, top = self.position.y - self.car_sprite_height, self.position.y + self.car_sprite_height
-
-        old_points = np.array([(right, top), (right, bottom), (left, top), (left, bottom)])
-        new_points = np.empty((0, 2), np.int_)
-
-        for old_x, old_y in old_points:
-            x, y = old_x - self.position.x, old_y - self.position.y
-            new_x = self.position.x + x * cos_alpha - y * sin_alpha
-            new_y = self.position.y + x * sin_alpha + y * cos_alpha
-            new_points = np.append(new_points, [(int(new_x), int(new_y))], axis=0)
-
-        self.collision_points = new_points
-
-    def _check_collision(self, screen, surface):
+        with np.errstate(divide="ignore"):
+            turning_radius = self.chassis_length / np.sin(np.radians(steering))
+        angular_velocity = np.where(steering != 0, velocity / turning_radius, 0.0)
+
+        heading = np.radians(-self.angle[idx])
+        self.position[idx] += np.stack((np.cos(heading), np.sin(heading)), axis=1) * (velocity * dt)[:, None]
+        self.angle[idx] += np.degrees(angular_velocity) * dt
+        self.velocity[idx], self.acceleration[idx], self.steering[idx] = velocity, acceleration, steering
+
+    def _check_params(self, velocity, acceleration, steering):
+        """Clips params which are out of maximum ranges"""
+        return (
+            np.clip(velocity, -self.max_velocity, self.max_velocity),
+            np.clip(acceleration, -self.max_acceleration, self.max_acceleration),
+            np.clip(steering, -self.max_steering, self.max_steering)
+        )
+
+    def _stop(self, idx):
+        """Stops car models"""
+        self.is_alive[idx] = False
+        self.acceleration[idx] = 0
+        self.velocity[idx] = 0
+        self.steering[idx] = 0
+
+    def _compute_collision_points(self, idx):
+        """Calculates collision points along the sides of the cars"""
+        alpha = np.radians(-self.angle[idx])
+        sin_alpha, cos_alpha = np.sin(alpha)[:, None], np.cos(alpha)[:, None]
+
+        w, h = self.car_sprite_width, self.car_sprite_height
+        x, y = np.array([w, w, -w, -w]), np.array([h, -h, h, -h])
+
+        new_x = self.position[idx, 0, None] + x * cos_alpha - y * sin_alpha
+        new_y = self.position[idx, 1, None] + x * sin_alpha + y * cos_alpha
+        self.collision_points[idx] = np.stack((new_x, new_y), axis=2).astype(np.int_)
+
+    def _check_collision(self, idx, surface):
         """Checks for collisions and reduces score for collisions with grass and markings"""
-        for point in self.collision_points:
-            try:
-                color = screen.get_at(point)
-                if color == surface.grass_color:
-                    self.score -= 10
-                    self._stop()
-                    break
-                elif color == surface.markup_color:
-                    self.score -= 5
-                    break
-            except IndexError:
-                self.score -= 10
-                self._stop()
-
-    def _compute_radars(self, screen, surface):
-        """Calculates radars and distances from car to surface facilities"""
-        car_angles = np.array([radians(90 - self.angle - 45 * angle) for angle in range(5)])
-        self.radars = np.empty((0, 2), np.int_)
-        self.radars_data = np.empty(0, np.int_)
-        length, x, y = 0, 0, 0
-
-        for angle in car_angles:
-            for length in range(1, self.max_radar_len + 1):
-                x = int(self.position.x + length * cos(angle))
-                y = int(self.position.y + length * sin(angle))
-                try:
-                    color = screen.get_at((x, y))
-                    if not self._check_color(color, surface):
-                        break
-                except IndexError:
-                    break
-
-            self.radars = np.append(self.radars, [(x, y)], axis=0)
-            self.radars_data = np.append(self.radars_data, length / self.max_radar_len)
-
-    @staticmethod
-    def _color_distance(*colors):
-        """Calculates distance between rgb colors"""
-        return sqrt(sum(map(lambda a, b: (a - b) ** 2, *colors)))
-
-    def _check_color(self, color, surface, *, limit=60):
-        """Checks that the surface color matches the colors allowed for driving"""
-        return any([
-            self._color_distance(color, surface.road_color) < limit,
-            self._color_distance(color, surface.pointers_color) < limit,
-            self._color_distance(color, surface.road_pointers_color) < limit
-        ])
-
-    def _compute_score(self):
+        points = self.collision_points[idx]
+        surface_types = surface.get_surface_type(points[..., 0], points[..., 1], self.maps[idx, None])
+
+        # the first collision point off the road determines the penalty
+        off_road = surface_types != surface.ROAD
+        first = surface_types[np.arange(len(idx)), off_road.argmax(axis=1)]
+        grass = off_road.any(axis=1) & (first == surface.GRASS)
+        markup = off_road.any(axis=1) & (first == surface.MARKUP)
+
+        self.score[idx] -= 10 * grass + 5 * markup
+        self._stop(idx[grass])
+
+    def _compute_progress(self, idx, surface):
+        """Tracks arc length progress of the cars along the highway by the nearest curve point near the last one"""
+        # a single highway is treated as a stack of one map
+        curves = surface.highway_curve.reshape(-1, *surface.highway_curve.shape[-2:])
+        arc_length = np.reshape(surface.arc_length, (len(curves), -1))
+        half_length = np.reshape(surface.highway_length, -1)[self.maps[idx]] / 2
+        direction = np.reshape(surface.progress_direction, -1)[self.maps[idx]]
+        maps, position = self.maps[idx], self.position[idx]
+
+        # the first search covers the whole curve
+        unknown = self.curve_index[idx] < 0
+        if unknown.any():
+            distances = ((position[unknown, None] - curves[maps[unknown]]) ** 2).sum(axis=2)
+            self.curve_index[idx[unknown]] = distances.argmin(axis=1)
+
+        last = self.curve_index[idx]
+        window = (last[:, None] + np.arange(-self.progress_window, self.progress_window + 1)) % curves.shape[1]
+        distances = ((position[:, None] - curves[maps[:, None], window]) ** 2).sum(axis=2)
+        nearest = window[np.arange(len(idx)), distances.argmin(axis=1)]
+
+        # progress difference is wrapped around the closed curve and signed by the driving direction
+        delta = arc_length[maps, nearest] - arc_length[maps, last]
+        self.progress[idx] += ((delta + half_length) % (2 * half_length) - half_length) * direction
+        self.curve_index[idx] = nearest
+
+    def _check_stall(self, idx):
+        """Retires alive cars which made no progress along the highway within the stall window"""
+        idx = idx[self.is_alive[idx]]
+        advanced = self.progress[idx] - self.progress_mark[idx] >= self.stall_progress
+        self.progress_mark[idx] = np.where(advanced, self.progress[idx], self.progress_mark[idx])
+        self.stall_time[idx] = np.where(advanced, 0, self.stall_time[idx] + 1)
+        self._stop(idx[self.stall_time[idx] >= self.stall_window])
+
+    def _compute_radars(self, idx, surface):
+        """Calculates radars and distances from alive cars to surface facilities"""
+        idx = idx[self.is_alive[idx]]
+        if idx.size:
+            radars_data, radars = self.radars_engine.compute(
+                self.position[idx], self.angle[idx], self.max_radar_len, surface, self.maps[idx]
+            )
+            self.radars_data[idx], self.radars[idx] = radars_data, radars
+
+    def _compute_score(self, idx):
         """Charges score points for forward driving quality"""
-        self.score += self.velocity.x * 0.01 / self.scale if self.velocity.x > 0 else -0.01
+        velocity = self.velocity[idx]
+        self.score[idx] += np.where(velocity > 0, velocity * 0.01 / self.scale, -0.01)
+
+    def respawn(self, indices, spawn_position, spawn_angle, surface=None):
+        """Puts cars back to spawn positions with a clean motion, score and progress, radars are sensed on surface"""
+        idx = np.asarray(indices, np.int_)
+        self.position[idx] = spawn_position
+        self.angle[idx] = spawn_angle
+        self.velocity[idx] = 0
+        self.acceleration[idx] = 0
+        self.steering[idx] = 0
+        self.is_alive[idx] = True
+        self.score[idx] = 0
+        self.curve_index[idx] = -1
+        self.progress[idx] = 0
+        self.progress_mark[idx] = 0
+        self.stall_time[idx] = 0
+        self.radars[idx] = 0
+        self.radars_data[idx] = 0
+
+        self._compute_collision_points(idx)
+        if surface is not None:
+            self._compute_radars(idx, surface)
+
+    def step(self, actions, dt, surface, indices=None):
+        """Moves alive cars according to the kinematics laws and (N, 2) array of direction and rotation actions"""
+        idx = np.arange(self.size) if indices is None else np.asarray(indices, np.int_)
+        actions = np.asarray(actions).reshape(-1, 2)
+        idx, actions = idx[self.is_alive[idx]], actions[self.is_alive[idx]]
+
+        if idx.size:
+            self._update(idx, actions, dt)
+            self.profiler.lap("update")
+            self._compute_collision_points(idx)
+            self._check_collision(idx, surface)
+            self.profiler.lap("collision")
+            self._compute_progress(idx, surface)
+            if self.stall_window:
+                self._check_stall(idx)
+            self.profiler.lap("progress")
+            self._compute_radars(idx, surface)
+            self.profiler.lap("radars")
+            self._compute_score(idx)
+            self.profiler.lap("score")
+
+
+class Car:
+    """Kinematic model of a car with radars for calculating distances to objects, viewed from a fleet of cars"""
+    DIRECTIONS = {"forward": 1, "backward": -1, "neutral": 0}
+    ROTATIONS = {"right": 1, "left": -1, "neutral": 0}
+
+    def __init__(self, spawn_position=(0.0, 0.0), spawn_angle=0, scale=1,
+                 show_collision=False, show_radars=False, show_score=False, fleet=None, index=0):
+        self.fleet = fleet if fleet else CarFleet(1, spawn_position, spawn_angle, scale)
+        self.index = index
+        self.sprite_index = _sprites_random.randint(0, len(car_sprites) - 1)
+
+        self.show_collision_points = show_collision
+        self.show_radars = show_radars
+        self.show_score = show_score
+
+    @property
+    def position(self):
+        return Vector2(*self.fleet.position[self.index])
+
+    @property
+    def angle(self):
+        return self.fleet.angle[self.index]
+
+    @property
+    def velocity(self):
+        return Vector2(self.fleet.velocity[self.index], 0.0)
+
+    @property
+    def acceleration(self):
+        return self.fleet.acceleration[self.index]
+
+    @property
+    def steering(self):
+        return self.fleet.steering[self.index]
+
+    @property
+    def is_alive(self):
+        return self.fleet.is_alive[self.index]
+
+    @property
+    def score(self):
+        return self.fleet.score[self.index]
+
+    @property
+    def progress(self):
+        return self.fleet.progress[self.index]
+
+    @property
+    def radars(self):
+        return self.fleet.radars[self.index]
+
+    @property
+    def radars_data(self):
+        return self.fleet.radars_data[self.index]
+
+    @property
+    def collision_points(self):
+        return self.fleet.collision_points[self.index]
+
+    @property
+    def max_velocity(self):
+        return self.fleet.max_velocity
+
+    @property
+    def scale(self):
+        return self.fleet.scale
 
-    def move(self, movement, dt, screen, surface):
+    def move(self, movement, dt, surface):
         """Moves a car model according to the kinematics laws and the input direction"""
-        if self.is_alive:
-            self._update(movement, dt)
-            self._compute_collision_points()
-            self._check_collision(screen, surface)
-            self._compute_radars(screen, surface)
-            self._compute_score()
+        direction = self.DIRECTIONS.get(movement["direction"], movement["direction"])
+        rotation = self.ROTATIONS.get(movement["rotation"], movement["rotation"])
+        self.fleet.step([(direction, rotation)], dt, surface, indices=[self.index])
 
     def draw(self, screen):
-        """Renders a car model with radars and collision points"""
+        """Renders a car model with radars and collision points and returns the screen areas it covers"""
+        areas = []
+        position = self.position
         if self.is_alive and self.show_radars:
             for coord in self.radars:
-                pg.draw.aaline(screen, (255, 140, 0), self.position, coord, 1)
-                pg.draw.circle(screen, (255, 140, 0), coord, 5)
+                areas.append(pg.draw.aaline(screen, (255, 140, 0), position, coord, 1))
+                areas.append(pg.draw.circle(screen, (255, 140, 0), coord, 5))
 
         if self.show_collision_points:
             for coord in self.collision_points:
                 if self.is_alive:
-                    pg.draw.circle(screen, (15, 192, 252), coord, 5)
+                    areas.append(pg.draw.circle(screen, (15, 192, 252), coord, 5))
                 else:
-                    pg.draw.circle(screen, (255, 0, 0), coord, 5)
+                    areas.append(pg.draw.circle(screen, (255, 0, 0), coord, 5))
 
-        rotated = pg.transform.rotate(self.car_sprite, self.angle)
+        rotated = car_sprites.get_rotated(self.sprite_index, self.scale, self.angle)
         rect = rotated.get_rect()
-        screen.blit(rotated, self.position - Vector2(rect.width / 2, rect.height / 2))
+        areas.append(screen.blit(rotated, position - Vector2(rect.width / 2, rect.height / 2)))
 
         if self.show_score:
-            font = pg.font.SysFont("Comic Sans MS", int(20 * self.scale))
-            label = font.render(str(round(self.score)), True, (0, 0, 0))
+            label = labels.render(str(round(self.score)), int(20 * self.scale), (0, 0, 0))
             label_rect = label.get_rect()
-            label_rect.center = self.position
-            screen.blit(label, label_rect)
+            label_rect.center = position
+            areas.append(screen.blit(label, label_rect))
+        return areas
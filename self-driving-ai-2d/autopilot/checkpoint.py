@@ -0,0 +1,164 @@
+import os
+import glob
+import gzip
+import json
+import time
+import queue
+import pickle
+import random
+import threading
+import numpy as np
+from neat.population import Population
+from neat.reporting import BaseReporter
+
+__all__ = "AsyncCheckpointer"
+
+
+class AsyncCheckpointer(BaseReporter):
+    """NEAT checkpointer compressing and writing populations in a background thread with a retention policy"""
+
+    def __init__(self, generation_interval=10, time_interval_seconds=None, filename_prefix="neat-checkpoint-",
+                 keep_last=3, keep_best=1, compresslevel=5, resume=False):
+        self.generation_interval = generation_interval
+        self.time_interval_seconds = time_interval_seconds
+        self.filename_prefix = filename_prefix
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        self.compresslevel = compresslevel
+
+        self.current_generation = None
+        self.last_generation_checkpoint = -1
+        self.last_time_checkpoint = time.time()
+        self.best_fitness = None
+        # a fresh run starts a new index, so checkpoints of older runs are neither retained nor resumed
+        self.index = self._load_index(self.index_path) if resume else {}
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self.error = None
+
+    def __getstate__(self):
+        # the species set keeps its reporters, so the checkpointer is pickled into checkpoints without the writer
+        # and the index it is updating at the same time
+        state = dict(self.__dict__)
+        state.update(index={}, _queue=None, _thread=None, error=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._queue = queue.Queue()
+
+    @property
+    def index_path(self):
+        """Path of the JSON file with fitness of the retained checkpoints"""
+        return f"{self.filename_prefix}index.json"
+
+    @staticmethod
+    def _load_index(index_path):
+        """Reads fitness of checkpoints retained by the last run"""
+        if not os.path.exists(index_path):
+            return {}
+        with open(index_path) as f:
+            return {int(generation): fitness for generation, fitness in json.load(f).items()}
+
+    def start_generation(self, generation):
+        self.current_generation = generation
+
+    def post_evaluate(self, config, population, species, best_genome):
+        self.best_fitness = best_genome.fitness
+
+    def end_generation(self, config, population, species_set):
+        checkpoint_due = False
+        if self.time_interval_seconds is not None:
+            checkpoint_due = time.time() - self.last_time_checkpoint >= self.time_interval_seconds
+        if not checkpoint_due and self.generation_interval is not None:
+            checkpoint_due = self.current_generation - self.last_generation_checkpoint >= self.generation_interval
+
+        if checkpoint_due:
+            self.save_checkpoint(config, population, species_set, self.current_generation)
+            self.last_generation_checkpoint = self.current_generation
+            self.last_time_checkpoint = time.time()
+
+    def save_checkpoint(self, config, population, species_set, generation):
+        """Pickles the state in the training thread and queues it for compression and writing"""
+        if self.error:
+            raise self.error
+        data = (generation, config, population, species_set, random.getstate())
+        # numpy random state follows as a second pickle which neat.Checkpointer doesn't read
+        payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        payload += pickle.dumps(np.random.get_state(), protocol=pickle.HIGHEST_PROTOCOL)
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._write_loop, daemon=True)
+            self._thread.start()
+        self._queue.put((generation, self.best_fitness, payload))
+
+    def _write_loop(self):
+        """Writes queued checkpoints until the closing sentinel or the first error"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._write(*item)
+            except BaseException as error:
+                self.error = error
+                break
+
+    def _write(self, generation, fitness, payload):
+        """Writes a compressed checkpoint atomically and removes the ones out of the retention policy"""
+        filename = f"{self.filename_prefix}{generation}"
+        print(f"Saving checkpoint to {filename}")
+        with open(f"{filename}.tmp", "wb") as f:
+            f.write(gzip.compress(payload, self.compresslevel))
+        os.replace(f"{filename}.tmp", filename)
+
+        self.index[generation] = fitness
+        scored = sorted((key for key in self.index if self.index[key] is not None), key=self.index.get)
+        retained = set(sorted(self.index)[::-1][:self.keep_last]) | set(scored[::-1][:self.keep_best])
+        for old in set(self.index) - retained:
+            if os.path.exists(f"{self.filename_prefix}{old}"):
+                os.remove(f"{self.filename_prefix}{old}")
+            del self.index[old]
+
+        with open(f"{self.index_path}.tmp", "w") as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(f"{self.index_path}.tmp", self.index_path)
+
+    def close(self):
+        """Waits until the queued checkpoints are written and re-raises the writing error"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self.error:
+            raise self.error
+
+    @staticmethod
+    def latest_checkpoint(filename_prefix):
+        """Returns the path of the last run checkpoint with the highest generation number or None"""
+        index = AsyncCheckpointer._load_index(f"{filename_prefix}index.json")
+        generations = [generation for generation in index if os.path.exists(f"{filename_prefix}{generation}")]
+        if generations:
+            return f"{filename_prefix}{max(generations)}"
+
+        # checkpoints written without an index, e.g. by neat.Checkpointer
+        generations = [
+            int(path[len(filename_prefix):]) for path in glob.glob(f"{glob.escape(filename_prefix)}*")
+            if path[len(filename_prefix):].isdigit()
+        ]
+        return f"{filename_prefix}{max(generations)}" if generations else None
+
+    @staticmethod
+    def restore_checkpoint(filename):
+        """Resumes the population and random states from a checkpoint compatible with neat.Checkpointer"""
+        with gzip.open(filename) as f:
+            generation, config, population, species_set, rndstate = pickle.load(f)
+            try:
+                np_rndstate = pickle.load(f)
+            except EOFError:
+                np_rndstate = None
+        random.setstate(rndstate)
+        if np_rndstate is not None:
+            np.random.set_state(np_rndstate)
+        return Population(config, (population, species_set, generation))
@@ -0,0 +1,211 @@
+import os
+import numpy as np
+import multiprocessing as mp
+from autopilot.highway import Highway, HighwayStack
+from autopilot.car import CarFleet
+from autopilot.radars import Radars
+from autopilot.mapbank import MapBank
+from autopilot.simulation import Simulation
+
+__all__ = "VecEnv", "SubprocVecEnv"
+
+
+class VecEnv:
+    """Batch of independent headless cars on highways with a gym-style vectorized reset and step API"""
+    OBSERVATION_SIZE, ACTION_SIZE = 6, 2
+
+    def __init__(self, num_envs, maps=1, map_spread=(150, 350), map_complexity=5, time_limit=10000, dt=0.1,
+                 radars_mode="march", stall_window=None, stall_progress=5.0, reward="score", map_bank=None,
+                 size=(1320, 768)):
+        if reward not in {"score", "progress"}:
+            raise ValueError(f"Reward can be computed by either score or progress, got {reward!r}!")
+
+        # environment i drives on the highway i modulo maps
+        self.num_envs = num_envs
+        self.highways = HighwayStack([
+            Highway((size[0] // 2, size[1] // 2), map_spread, map_complexity, width=30, size=size)
+            for _ in range(maps)
+        ])
+        self.surface = self.highways if maps > 1 else self.highways[0]
+        self.map_bank = MapBank(map_bank) if map_bank else None
+        self.map = -1
+
+        self.fleet = CarFleet(
+            num_envs, scale=0.5, radars=Radars(count=self.OBSERVATION_SIZE - 1, mode=radars_mode),
+            stall_window=stall_window, stall_progress=stall_progress, maps=np.arange(num_envs) % maps
+        )
+        self.time_limit = time_limit
+        self.dt = dt
+        self.reward = reward
+        self.time = np.zeros(num_envs, np.int_)
+
+        # buffers are reused by every step, copy them to keep the values
+        self.observations = np.zeros((num_envs, self.OBSERVATION_SIZE), np.float32)
+        self.rewards = np.zeros(num_envs, np.float32)
+        self.dones = np.zeros(num_envs, np.bool_)
+
+    def __len__(self):
+        return self.num_envs
+
+    def _respawn(self, idx):
+        """Restarts environments with cars on the start positions of their highways"""
+        maps = self.fleet.maps[idx]
+        positions = np.array([highway.start_position for highway in self.highways], np.float64)[maps]
+        angles = np.array([highway.start_angle for highway in self.highways], np.float64)[maps]
+        self.fleet.respawn(idx, positions, angles, self.surface)
+        self.time[idx] = 0
+
+    def _observe(self):
+        """Fills the observation buffer with radars data and normalized velocity, the same inputs as networks get"""
+        self.observations[:, :-1] = self.fleet.radars_data
+        self.observations[:, -1] = self.fleet.velocity / self.fleet.max_velocity
+        return self.observations
+
+    def _measure(self):
+        """Returns a copy of the cumulative value rewards are computed from"""
+        return (self.fleet.progress if self.reward == "progress" else self.fleet.score).copy()
+
+    def reset(self, seed=None):
+        """Switches to new highways and restarts all environments, the seed selects the map bank entries if any"""
+        self.map = seed if self.map_bank and seed is not None else self.map + 1
+        if self.map_bank:
+            for i, highway in enumerate(self.highways):
+                self.map_bank.load(highway, self.map * len(self.highways) + i)
+        else:
+            if seed is not None:
+                np.random.seed(seed)
+            for highway in self.highways:
+                highway.generate()
+
+        self._respawn(np.arange(self.num_envs))
+        return self._observe()
+
+    def step(self, actions):
+        """Moves cars by (num_envs, 2) direction and rotation actions and restarts finished environments
+
+        Actions are thresholded the same way as network outputs, so both {-1, 0, 1} and continuous values work.
+        Infos of finished environments hold the terminal observation, final score and progress.
+        """
+        fleet = self.fleet
+        actions = Simulation._map_movement(np.asarray(actions, np.float64).reshape(self.num_envs, self.ACTION_SIZE))
+
+        before = self._measure()
+        fleet.step(actions, self.dt, self.surface)
+        self.time += 1
+        self.rewards[:] = self._measure() - before
+        self.dones[:] = ~fleet.is_alive | (self.time >= self.time_limit)
+        self._observe()
+
+        infos = [{} for _ in range(self.num_envs)]
+        done = np.flatnonzero(self.dones)
+        for i in done:
+            infos[i] = {
+                "terminal_observation": self.observations[i].copy(),
+                "score": float(fleet.score[i]),
+                "progress": float(fleet.progress[i]),
+                "TimeLimit.truncated": bool(fleet.is_alive[i])
+            }
+        if done.size:
+            self._respawn(done)
+            self._observe()
+
+        return self.observations, self.rewards, self.dones, infos
+
+    def close(self):
+        """Releases environments resources, nothing to release in process"""
+
+
+def _shared_array(shape, dtype):
+    """Allocates a lock-free shared memory buffer for a numpy array"""
+    return mp.RawArray("b", int(np.prod(shape)) * np.dtype(dtype).itemsize)
+
+
+def _view(buffer, shape, dtype):
+    """Wraps a shared memory buffer into a numpy array without copying"""
+    return np.frombuffer(buffer, dtype).reshape(shape)
+
+
+def _run_worker(connection, buffers, offset, num_envs, settings):
+    """Steps a slice of environments in a subprocess exchanging data through shared memory buffers"""
+    observations, actions, rewards, dones = [
+        _view(buffer, shape, dtype)[offset:offset + num_envs] for buffer, shape, dtype in buffers
+    ]
+    # forked workers inherit the parent random state and would generate the same highways
+    np.random.seed()
+    env = VecEnv(num_envs, **settings)
+
+    while True:
+        command, seed = connection.recv()
+        if command == "step":
+            observations[:], rewards[:], dones[:], infos = env.step(actions)
+            connection.send({i: info for i, info in enumerate(infos) if info})
+        elif command == "reset":
+            observations[:] = env.reset(seed)
+            connection.send(None)
+        elif command == "close":
+            env.close()
+            connection.close()
+            break
+
+
+class SubprocVecEnv:
+    """Environments split across worker processes sharing observation, action, reward and done buffers"""
+    OBSERVATION_SIZE, ACTION_SIZE = VecEnv.OBSERVATION_SIZE, VecEnv.ACTION_SIZE
+
+    def __init__(self, num_envs, workers=None, **settings):
+        self.num_envs = num_envs
+        workers = min(workers or os.cpu_count(), num_envs)
+
+        buffers = [
+            ((num_envs, self.OBSERVATION_SIZE), np.float32),
+            ((num_envs, self.ACTION_SIZE), np.float64),
+            ((num_envs,), np.float32),
+            ((num_envs,), np.bool_)
+        ]
+        buffers = [(_shared_array(shape, dtype), shape, dtype) for shape, dtype in buffers]
+        self.observations, self.actions, self.rewards, self.dones = [_view(*buffer) for buffer in buffers]
+
+        chunks = np.array_split(np.arange(num_envs), workers)
+        self.offsets = [chunk[0] for chunk in chunks]
+        self.connections, self.processes = [], []
+        for chunk in chunks:
+            parent, child = mp.Pipe()
+            process = mp.Process(
+                target=_run_worker, args=(child, buffers, chunk[0], len(chunk), settings), daemon=True
+            )
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def __len__(self):
+        return self.num_envs
+
+    def reset(self, seed=None):
+        """Restarts all environments, each worker gets its own seed derived from the given one"""
+        for i, connection in enumerate(self.connections):
+            connection.send(("reset", None if seed is None else seed + i))
+        for connection in self.connections:
+            connection.recv()
+        return self.observations
+
+    def step(self, actions):
+        """Moves cars in all workers at once, only infos of finished environments are sent through pipes"""
+        self.actions[:] = np.asarray(actions, np.float64).reshape(self.num_envs, self.ACTION_SIZE)
+        for connection in self.connections:
+            connection.send(("step", None))
+
+        infos = [{} for _ in range(self.num_envs)]
+        for offset, connection in zip(self.offsets, self.connections):
+            for i, info in connection.recv().items():
+                infos[offset + i] = info
+
+        return self.observations, self.rewards, self.dones, infos
+
+    def close(self):
+        """Stops worker processes"""
+        for connection in self.connections:
+            connection.send(("close", None))
+            connection.close()
+        for process in self.processes:
+            process.join()
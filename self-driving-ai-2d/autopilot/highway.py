@@ -1,14 +1,17 @@
 import numpy as np
 import pygame as pg
-from math import pi, sin, cos, sqrt, acos, degrees
+from math import pi, sin, cos, sqrt, acos, radians, degrees
 from scipy.interpolate import splprep, splev
+from scipy.ndimage import distance_transform_edt
 
-__all__ = "Highway"
+__all__ = "Highway", "HighwayStack"
 
 
 class Highway:
     """Highway based on a random-generated curve"""
-    def __init__(self, position, spread=(250, 350), complexity=3, width=30):
+    GRASS, ROAD, MARKUP = 0, 1, 2
+
+    def __init__(self, position, spread=(250, 350), complexity=3, width=30, size=None, generate=True):
         self.grass_color = 63, 155, 11, 255
         self.markup_color = 255, 255, 255, 255
         self.road_color = 80, 80, 80, 255
@@ -16,14 +19,24 @@ class Highway:
         self.road_pointers_color = 161, 134, 45, 255
 
         self.x, self.y = position
+        self.size = size if size else (2 * self.x, 2 * self.y)
         self.min_uniform, self.max_uniform = spread
         self.complexity = complexity
         self.width = width
         self.highway_curve = None
         self.highway_markup = None
+        self.arc_length = None
+        self.highway_length = 0
+        self.progress_direction = 1
         self.start_position = 0, 0
         self.start_angle = 0
-        self.generate()
+        self.background = None
+        self.mask = None
+        self.distance_field = None
+
+        # highways loaded from a map bank or a recorded curve are built later by the caller
+        if generate:
+            self.generate()
 
     def generate(self, points_num=1000):
         """Generates a random curve using random circle polarization and B-spline"""
@@ -32,23 +45,154 @@ class Highway:
         phi = np.arange(0, 2 * pi, pi / self.complexity)
         points = np.array([(self.x + r * cos(p), self.y + r * sin(p)) for r, p in zip(rho, phi)])
         tck, u = splprep(points.T, s=0.0, per=1)
+        self.build(np.c_[splev(np.linspace(u.min(), u.max(), points_num), tck, der=0)].T)
+
+    def build(self, highway_curve, mask=None, distance_field=None):
+        """Builds highway markup, start position and surface maps from the closed highway curve"""
+        points_num = len(highway_curve)
 
         # highway curve and markup generation
-        self.highway_curve = np.c_[splev(np.linspace(u.min(), u.max(), points_num), tck, der=0)].T
+        self.highway_curve = highway_curve
         self.highway_markup = np.array_split(self.highway_curve, 5 * points_num // self.width)[::2]
 
+        # cumulative arc length along the closed highway curve
+        segments = np.linalg.norm(np.diff(self.highway_curve, axis=0, append=self.highway_curve[:1]), axis=1)
+        self.arc_length = np.concatenate(([0.0], np.cumsum(segments[:-1])))
+        self.highway_length = segments.sum()
+
         # start car position and angle computation
         idx = points_num // 10
         (x1, y1), (x2, y2) = self.highway_curve[idx], self.highway_curve[idx + self.width]
         self.start_position = x1, y1
         self.start_angle = 180 - degrees(acos((x2 - x1) / sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)))
 
-    def draw(self, screen):
-        """Renders highway curve and its markup"""
-        screen.fill(self.grass_color)
+        # cars drive along or against the curve points order depending on the start angle
+        heading = cos(radians(-self.start_angle)), sin(radians(-self.start_angle))
+        self.progress_direction = 1 if heading[0] * (x2 - x1) + heading[1] * (y2 - y1) > 0 else -1
+
+        # static background rendering, surface types rasterization and distances to the road edges,
+        # precomputed surface maps are taken as is and the background is rendered only when drawn
+        self.background = None
+        if mask is None:
+            self._render()
+            self._rasterize()
+        else:
+            self.mask = mask
+        if distance_field is None:
+            self._compute_distance_field()
+        else:
+            self.distance_field = distance_field
+
+    def _render(self):
+        """Renders highway curve and its markup once into the cached background surface"""
+        background = pg.Surface(self.size)
+        background.fill(self.grass_color)
         for coord in self.highway_curve:
-            pg.draw.circle(screen, self.markup_color, coord, 1.1 * self.width)
+            pg.draw.circle(background, self.markup_color, coord, 1.1 * self.width)
         for coord in self.highway_curve:
-            pg.draw.circle(screen, self.road_color, coord, self.width)
+            pg.draw.circle(background, self.road_color, coord, self.width)
         for pts in self.highway_markup:
-            pg.draw.aalines(screen, self.pointers_color, False, pts)
+            pg.draw.aalines(background, self.pointers_color, False, pts)
+
+        # pixel format conversion is only possible when the display mode is set
+        self.background = background.convert() if pg.display.get_surface() else background
+
+    def _rasterize(self, *, limit=60):
+        """Classifies pixels of the background into a surface types mask indexed as mask[x, y]"""
+        pixels = pg.surfarray.array3d(self.background).astype(np.int32)
+
+        road = np.zeros(self.size, np.bool_)
+        for color in (self.road_color, self.pointers_color, self.road_pointers_color):
+            road |= ((pixels - color[:3]) ** 2).sum(axis=2) < limit ** 2
+        markup = (pixels == self.markup_color[:3]).all(axis=2)
+
+        self.mask = np.full(self.size, self.GRASS, np.uint8)
+        self.mask[markup] = self.MARKUP
+        self.mask[road] = self.ROAD
+
+    def _compute_distance_field(self):
+        """Calculates distances from each road pixel to the nearest off-road pixel, the map border is off-road too"""
+        road = np.pad(self.mask == self.ROAD, 1)
+        self.distance_field = distance_transform_edt(road)[1:-1, 1:-1].astype(np.float32)
+
+    def _lookup(self, grid, x, y, default):
+        """Returns grid values at the given points or default value for the points outside the map"""
+        x, y = np.asarray(x), np.asarray(y)
+        width, height = self.size
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        return np.where(inside, grid[np.clip(x, 0, width - 1), np.clip(y, 0, height - 1)], default)
+
+    def get_surface_type(self, x, y, maps=None):
+        """Returns surface types at the given points, everything outside the map is considered as grass"""
+        return self._lookup(self.mask, x, y, self.GRASS)
+
+    def get_distance(self, x, y, maps=None):
+        """Returns distances to the road edges at the given points, everything outside the map is off-road"""
+        return self._lookup(self.distance_field, x, y, 0)
+
+    def draw(self, screen):
+        """Renders highway curve and its markup"""
+        if self.background is None:
+            self._render()
+        screen.blit(self.background, (0, 0))
+
+
+class HighwayStack:
+    """Several highways simulated at once, surface lookups of each point are dispatched to the highway of its map"""
+    GRASS, ROAD, MARKUP = Highway.GRASS, Highway.ROAD, Highway.MARKUP
+
+    def __init__(self, highways):
+        self.highways = highways
+        self._curves = None
+        self._highway_curve = None
+        self._arc_length = None
+
+    def __len__(self):
+        return len(self.highways)
+
+    def __getitem__(self, index):
+        return self.highways[index]
+
+    def _stack(self):
+        """Stacks curves and arc lengths of the highways again only when some of them were rebuilt"""
+        curves = [highway.highway_curve for highway in self.highways]
+        if self._curves is None or any(curve is not cached for curve, cached in zip(curves, self._curves)):
+            self._curves = curves
+            self._highway_curve = np.stack(curves)
+            self._arc_length = np.stack([highway.arc_length for highway in self.highways])
+
+    @property
+    def highway_curve(self):
+        self._stack()
+        return self._highway_curve
+
+    @property
+    def arc_length(self):
+        self._stack()
+        return self._arc_length
+
+    @property
+    def highway_length(self):
+        return np.array([highway.highway_length for highway in self.highways])
+
+    @property
+    def progress_direction(self):
+        return np.array([highway.progress_direction for highway in self.highways])
+
+    def _dispatch(self, lookup, dtype, x, y, maps):
+        """Groups points by their maps and looks them up on the corresponding highways"""
+        x, y = np.asarray(x), np.asarray(y)
+        maps = np.broadcast_to(0 if maps is None else maps, x.shape)
+        values = np.zeros(x.shape, dtype)
+        for i in np.unique(maps):
+            selected = maps == i
+            values[selected] = getattr(self.highways[i], lookup)(x[selected], y[selected])
+        return values
+
+    def get_surface_type(self, x, y, maps=None):
+        """Returns surface types at the given points of the given maps"""
+        return self._dispatch("get_surface_type", np.uint8, x, y, maps)
+
+    def get_distance(self, x, y, maps=None):
+        """Returns distances to the road edges at the given points of the given maps"""
+        return self._dispatch("get_distance", np.float32, x, y, maps)
@@ -0,0 +1,37 @@
+import pygame as pg
+from collections import OrderedDict
+
+__all__ = "LabelCache", "labels"
+
+
+class LabelCache:
+    """Fonts created once per size and rendered text labels kept in a bounded cache keyed by text"""
+
+    def __init__(self, font_name="Comic Sans MS", max_labels=1024):
+        self.font_name = font_name
+        self.max_labels = max_labels
+        self.fonts = {}
+        self.labels = OrderedDict()
+
+    def __len__(self):
+        return len(self.labels)
+
+    def get_font(self, size):
+        """Returns the font of the given size resolving it through the system fonts only once"""
+        if size not in self.fonts:
+            self.fonts[size] = pg.font.SysFont(self.font_name, size)
+        return self.fonts[size]
+
+    def render(self, text, size, color):
+        """Returns the antialiased label surface, it is re-rendered only for text not seen recently"""
+        key = text, size, tuple(color)
+        if key in self.labels:
+            self.labels.move_to_end(key)
+        else:
+            self.labels[key] = self.get_font(size).render(text, True, color)
+            if len(self.labels) > self.max_labels:
+                self.labels.popitem(last=False)
+        return self.labels[key]
+
+
+labels = LabelCache()
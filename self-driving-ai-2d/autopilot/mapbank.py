@@ -0,0 +1,65 @@
+import numpy as np
+from autopilot.highway import Highway
+
+__all__ = "MapBank"
+
+
+class MapBank:
+    """Pre-generated seeded highways with their surface maps stored in a single memory-mapped .npy file"""
+
+    def __init__(self, path, mode="r"):
+        self.path = path
+        self.maps = np.load(path, mmap_mode=mode)
+
+    def __len__(self):
+        return len(self.maps)
+
+    @staticmethod
+    def create(path, count, size=(1320, 768), points_num=1000, distance_field=True):
+        """Allocates the .npy store for count highways and opens it for writing"""
+        fields = [
+            ("curve", np.float64, (points_num, 2)),
+            ("start_position", np.float64, (2,)),
+            ("start_angle", np.float64),
+            ("mask", np.uint8, tuple(size))
+        ]
+        if distance_field:
+            fields.append(("distance_field", np.float32, tuple(size)))
+        np.lib.format.open_memmap(path, mode="w+", dtype=np.dtype(fields), shape=(count,)).flush()
+        return MapBank(path, mode="r+")
+
+    @staticmethod
+    def build(path, count, seed=0, position=(660, 384), spread=(150, 350), complexity=5, width=30,
+              size=(1320, 768), points_num=1000, distance_field=True):
+        """Generates highways seeded by seed + map index and writes them into the .npy store"""
+        bank = MapBank.create(path, count, size, points_num, distance_field)
+
+        state = np.random.get_state()
+        highway = Highway(position, spread, complexity, width, size)
+        for i in range(count):
+            np.random.seed(seed + i)
+            highway.generate(points_num)
+            bank.store(highway, i)
+        np.random.set_state(state)
+
+        bank.maps.flush()
+        return MapBank(path)
+
+    def store(self, highway, index):
+        """Writes the built highway with its surface maps into the store opened for writing"""
+        self.maps["curve"][index] = highway.highway_curve
+        self.maps["start_position"][index] = highway.start_position
+        self.maps["start_angle"][index] = highway.start_angle
+        self.maps["mask"][index] = highway.mask
+        if "distance_field" in self.maps.dtype.names:
+            self.maps["distance_field"][index] = highway.distance_field
+
+    def load(self, highway, index):
+        """Switches the highway to the stored map, map indexes wrap around the bank size"""
+        index %= len(self.maps)
+        mask = self.maps["mask"][index]
+        if mask.shape != tuple(highway.size):
+            raise ValueError(f"Map bank size {mask.shape} doesn't match the highway size {tuple(highway.size)}!")
+
+        distance_field = self.maps["distance_field"][index] if "distance_field" in self.maps.dtype.names else None
+        highway.build(np.array(self.maps["curve"][index]), mask, distance_field)
@@ -0,0 +1,120 @@
+import neat
+import numpy as np
+
+__all__ = "NetworkBatch"
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(5.0 * z, -60.0, 60.0)))
+
+
+def _tanh(z):
+    return np.tanh(np.clip(2.5 * z, -60.0, 60.0))
+
+
+def _relu(z):
+    return np.maximum(z, 0.0)
+
+
+def _identity(z):
+    return z
+
+
+def _clamped(z):
+    return np.clip(z, -1.0, 1.0)
+
+
+class NetworkBatch:
+    """Population of NEAT feed-forward networks compiled into padded layered weight matrices"""
+    ACTIVATIONS = {
+        "sigmoid_activation": _sigmoid,
+        "tanh_activation": _tanh,
+        "relu_activation": _relu,
+        "identity_activation": _identity,
+        "clamped_activation": _clamped
+    }
+
+    def __init__(self, networks):
+        self.size = len(networks)
+        self.inputs_num = len(networks[0].input_nodes)
+        self.outputs_num = len(networks[0].output_nodes)
+
+        # value slots of each network: inputs, evaluated nodes, outputs which are never evaluated and a padding slot
+        slots = [self._allocate_slots(net) for net in networks]
+        self.padding_slot = max(map(len, slots))
+        self.slots_num = self.padding_slot + 1
+        self.output_slots = np.array([[slot[node] for node in net.output_nodes] for net, slot in zip(networks, slots)])
+
+        # nodes of each network grouped by topological depth
+        depths = [self._compute_depths(net) for net in networks]
+        layers_num = max([max(depth.values(), default=0) for depth in depths])
+        self.activations = list(self.ACTIVATIONS.values())
+        self.layers = [self._compile_layer(networks, slots, depths, layer) for layer in range(1, layers_num + 1)]
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def create(cls, genomes, config):
+        """Compiles a batch of networks from genomes the same way as FeedForwardNetwork does"""
+        return cls([neat.nn.FeedForwardNetwork.create(gen, config) for gen in genomes])
+
+    @staticmethod
+    def _allocate_slots(net):
+        """Maps network nodes to value slots"""
+        nodes = list(net.input_nodes) + [node for node, *_ in net.node_evals]
+        nodes += [node for node in net.output_nodes if node not in nodes]
+        return {node: slot for slot, node in enumerate(nodes)}
+
+    @staticmethod
+    def _compute_depths(net):
+        """Calculates topological depth of each evaluated node, network inputs have zero depth"""
+        depths = {node: 0 for node in net.input_nodes}
+        for node, _, _, _, _, links in net.node_evals:
+            depths[node] = 1 + max([depths[i] for i, _ in links], default=0)
+        return {node: depth for node, depth in depths.items() if node not in net.input_nodes}
+
+    def _compile_layer(self, networks, slots, depths, layer):
+        """Compiles nodes of the given depth of all networks into padded weights, biases and targets arrays"""
+        nodes = [[node_eval for node_eval in net.node_evals if depth[node_eval[0]] == layer]
+                 for net, depth in zip(networks, depths)]
+        width = max(map(len, nodes))
+
+        targets = np.full((self.size, width), self.padding_slot, np.int_)
+        weights = np.zeros((self.size, width, self.slots_num), np.float64)
+        biases = np.zeros((self.size, width), np.float64)
+        responses = np.zeros((self.size, width), np.float64)
+        activations = np.zeros((self.size, width), np.int_)
+
+        for n, (net_nodes, slot) in enumerate(zip(nodes, slots)):
+            for p, (node, act_func, agg_func, bias, response, links) in enumerate(net_nodes):
+                if agg_func is not neat.aggregations.sum_aggregation:
+                    raise ValueError(f"Only sum aggregation can be compiled, got {agg_func.__name__}!")
+                if act_func.__name__ not in self.ACTIVATIONS:
+                    raise ValueError(f"Activation {act_func.__name__} can not be compiled!")
+
+                targets[n, p] = slot[node]
+                biases[n, p], responses[n, p] = bias, response
+                activations[n, p] = list(self.ACTIVATIONS).index(act_func.__name__)
+                for i, w in links:
+                    weights[n, p, slot[i]] += w
+
+        return targets, weights, biases, responses, activations
+
+    def activate(self, inputs, indices=None):
+        """Activates networks with (n, inputs) array and returns (n, outputs) array, indices select the networks"""
+        idx = np.arange(self.size) if indices is None else np.asarray(indices, np.int_)
+        rows = np.arange(len(idx))[:, None]
+
+        values = np.zeros((len(idx), self.slots_num), np.float64)
+        values[:, :self.inputs_num] = inputs
+
+        for targets, weights, biases, responses, activations in self.layers:
+            z = biases[idx] + responses[idx] * np.einsum("npv,nv->np", weights[idx], values)
+            codes = activations[idx]
+            outputs = np.zeros_like(z)
+            for code in np.unique(codes):
+                outputs = np.where(codes == code, self.activations[code](z), outputs)
+            values[rows, targets[idx]] = outputs
+
+        return values[rows, self.output_slots[idx]]
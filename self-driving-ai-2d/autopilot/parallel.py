@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+from multiprocessing import Pool, cpu_count
+from autopilot.mapbank import MapBank
+
+__all__ = "ParallelEvaluator"
+
+_simulation = None
+
+
+def _init_worker(settings):
+    """Creates a headless simulation reused by all tasks of a worker process"""
+    global _simulation
+    from autopilot.simulation import Simulation
+    _simulation = Simulation(headless=True, **settings)
+    _simulation.map = None
+
+
+def _evaluate_chunk(task):
+    """Simulates a chunk of genomes on the shared highways and returns their fitness with the elapsed time"""
+    highway_map, time, genomes, config = task
+    if _simulation.map != highway_map:
+        _simulation.map = highway_map
+        _simulation._load_maps()
+
+    _simulation.time = time
+    _simulation.evaluate(genomes, config)
+    fitness = [(key, gen.fitness) for key, gen in genomes]
+    return fitness, _simulation.time, _simulation.cars_left
+
+
+class ParallelEvaluator:
+    """Evaluates generation genomes on the same highways split across a pool of headless worker processes"""
+
+    def __init__(self, simulation, workers=None):
+        self.simulation = simulation
+        self.workers = workers if workers else cpu_count()
+
+        # random-generated highways are built once by the main process and shared with workers
+        # through a memory-mapped store of the current map instead of being rebuilt in every worker
+        self.directory, self.maps, self.shared_map = None, None, None
+        if simulation.map_bank:
+            map_bank = simulation.map_bank.path
+        else:
+            self.directory = tempfile.mkdtemp(prefix="autopilot-")
+            map_bank = os.path.join(self.directory, "highways.npy")
+            highway = simulation.highway
+            self.maps = MapBank.create(map_bank, len(simulation.highways), highway.size, len(highway.highway_curve))
+            self._share_maps()
+
+        self.pool = Pool(
+            self.workers,
+            initializer=_init_worker,
+            initargs=(dict(
+                time_per_map=simulation.time_per_map,
+                dt=simulation.dt,
+                radars_mode=simulation.radars.mode,
+                stall_window=simulation.stall_window,
+                stall_progress=simulation.stall_progress,
+                fitness=simulation.fitness,
+                map_bank=map_bank,
+                maps_per_generation=len(simulation.highways),
+                fitness_aggregate=simulation.fitness_aggregate
+            ),)
+        )
+
+    def close(self):
+        """Stops worker processes"""
+        if self.pool:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        if self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory, self.maps = None, None
+
+    def _share_maps(self):
+        """Writes highways of the current map into the shared store, workers reload them by the map number"""
+        sim = self.simulation
+        for i, highway in enumerate(sim.highways):
+            self.maps.store(highway, i)
+        self.maps.maps.flush()
+        self.shared_map = sim.map
+
+    def evaluate(self, genomes, config):
+        """Splits genomes into chunks, evaluates them in worker processes and collects their fitness"""
+        sim = self.simulation
+        sim.generation += 1
+
+        if self.maps and self.shared_map != sim.map:
+            self._share_maps()
+
+        chunks = [chunk for chunk in np.array_split(np.arange(len(genomes)), self.workers) if chunk.size]
+        tasks = [(sim.map, sim.time, [genomes[i] for i in chunk], config) for chunk in chunks]
+        results = self.pool.map(_evaluate_chunk, tasks)
+
+        fitness = {key: value for chunk_fitness, _, _ in results for key, value in chunk_fitness}
+        for key, gen in genomes:
+            gen.fitness = fitness[key]
+        sim.best_score = max(fitness.values())
+
+        # cars of all chunks started at the same time, so the generation lasts as long as the longest chunk
+        time, cars_left = max((time, cars_left) for _, time, cars_left in results)
+        if cars_left and time > sim.time_per_map:
+            sim._next_map()
+        else:
+            sim.time = time
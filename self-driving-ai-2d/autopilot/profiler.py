@@ -0,0 +1,89 @@
+import os
+import csv
+import json
+import time
+
+__all__ = "PhaseProfiler", "NullProfiler"
+
+
+class PhaseProfiler:
+    """Wall time of simulation loop phases accumulated per generation and appended to CSV or JSON lines files"""
+    enabled = True
+    FORMATS = ".csv", ".jsonl"
+
+    def __init__(self, path):
+        if not isinstance(path, (str, os.PathLike)):
+            raise TypeError(f"Profile path should be a file path, got {path!r}!")
+        self.path = os.fspath(path)
+        if os.path.splitext(self.path)[1] not in self.FORMATS:
+            raise ValueError(f"Profile can be written to {' or '.join(self.FORMATS)} files only, got {self.path!r}!")
+
+        self.records = []
+        self.saved = 0
+        self.fields = None
+        self.record = {"generation": 0, "frames": 0}
+        self.mark = time.perf_counter()
+        self.show = True
+
+    def start(self, generation):
+        """Opens the record of a new generation"""
+        self.record = {"generation": generation, "frames": 0}
+        self.records.append(self.record)
+        self.mark = time.perf_counter()
+
+    def lap(self, phase):
+        """Adds the time passed since the previous lap to the phase"""
+        now = time.perf_counter()
+        self.record[phase] = self.record.get(phase, 0.0) + now - self.mark
+        self.mark = now
+
+    def frame(self):
+        """Counts a simulated frame of the generation"""
+        self.record["frames"] += 1
+
+    def summary(self):
+        """Returns the current generation phases in milliseconds per frame as a single line"""
+        record = dict(self.record)
+        del record["generation"]
+        frames = max(record.pop("frames"), 1)
+        return "  ".join(f"{phase}: {1000 * seconds / frames:.2f}" for phase, seconds in record.items()) + " ms"
+
+    def save(self):
+        """Appends records of the generations finished since the last save, the file is started over by a new run"""
+        records = self.records[self.saved:]
+        if not records:
+            return
+        mode = "a" if self.saved else "w"
+
+        if self.path.endswith(".csv"):
+            # the header lists the phases seen so far, the file is rewritten only when new phases show up
+            fields = list(dict.fromkeys(field for record in self.records for field in record))
+            if fields != self.fields:
+                self.fields, records, mode = fields, self.records, "w"
+            with open(self.path, mode, newline="") as f:
+                writer = csv.DictWriter(f, self.fields, restval=0.0)
+                if mode == "w":
+                    writer.writeheader()
+                writer.writerows(records)
+        else:
+            with open(self.path, mode) as f:
+                f.writelines(json.dumps(record) + "\n" for record in records)
+        self.saved = len(self.records)
+
+
+class NullProfiler:
+    """Disabled profiler with hooks doing nothing"""
+    enabled = False
+    show = False
+
+    def start(self, generation):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def frame(self):
+        pass
+
+    def save(self):
+        pass
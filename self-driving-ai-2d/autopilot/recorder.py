@@ -0,0 +1,151 @@
+import os
+import sys
+import numpy as np
+import pygame as pg
+from autopilot.highway import Highway
+from autopilot.car import CarFleet, Car
+from autopilot.labels import labels
+
+__all__ = "TrajectoryRecorder", "Replay"
+
+
+class TrajectoryRecorder:
+    """Per-frame states of generation cars stored in a preallocated structured array and flushed compressed"""
+    FRAME = np.dtype([
+        ("position", np.float32, (2,)),
+        ("angle", np.float32),
+        ("velocity", np.float32),
+        ("steering", np.float32),
+        ("is_alive", np.bool_),
+        ("score", np.float32)
+    ])
+
+    def __init__(self, directory="checkpoints/trajectories"):
+        self.directory = directory
+        self.generation = 0
+        self.frames = np.zeros((0, 0), self.FRAME)
+        self.frames_num = 0
+        self.header = {}
+
+    def start(self, generation, highways, fleet, sprites, frames=1024):
+        """Preallocates frames of a new generation and records the initial states of the fleet cars"""
+        self.generation = generation
+        self.frames = np.zeros((frames, len(fleet)), self.FRAME)
+        self.frames_num = 0
+        self.header = {
+            "curves": np.array([highway.highway_curve for highway in highways]),
+            "size": np.array(highways[0].size),
+            "width": highways[0].width,
+            "maps": fleet.maps.copy(),
+            "sprites": np.asarray(sprites)
+        }
+        self.record(fleet)
+
+    def record(self, fleet):
+        """Appends the current states of the fleet cars, the buffer is doubled when it runs out of frames"""
+        if self.frames_num == len(self.frames):
+            self.frames = np.concatenate((self.frames, np.zeros_like(self.frames)))
+
+        frame = self.frames[self.frames_num]
+        frame["position"] = fleet.position
+        frame["angle"] = fleet.angle
+        frame["velocity"] = fleet.velocity
+        frame["steering"] = fleet.steering
+        frame["is_alive"] = fleet.is_alive
+        frame["score"] = fleet.score
+        self.frames_num += 1
+
+    def flush(self):
+        """Writes recorded frames of the generation to a compressed file and returns its path"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"generation-{self.generation:05d}.npz")
+        np.savez_compressed(path, frames=self.frames[:self.frames_num], generation=self.generation, **self.header)
+        return path
+
+
+class Replay:
+    """Offline renderer of a recorded generation using the simulation highway and cars drawing"""
+
+    def __init__(self, path, map_index=0):
+        with np.load(path) as data:
+            cars = np.flatnonzero(data["maps"] == map_index)
+            self.frames = data["frames"][:, cars]
+            self.generation = int(data["generation"])
+            self.window = tuple(data["size"])
+            curve, width = data["curves"][map_index], int(data["width"])
+            sprites = data["sprites"][cars]
+
+        pg.init()
+        pg.display.set_caption('Self-driving replay')
+        self.width, self.height = self.window
+        self.screen = pg.display.set_mode(self.window, pg.FULLSCREEN)
+        self.clock = pg.time.Clock()
+
+        self.highway = Highway((self.width // 2, self.height // 2), width=width, size=self.window, generate=False)
+        self.highway.build(curve)
+        self.fleet = CarFleet(len(cars), scale=0.5)
+        self.cars = [Car(fleet=self.fleet, index=i) for i in range(len(cars))]
+        for car, sprite in zip(self.cars, sprites):
+            car.sprite_index = sprite
+        self.frame = 0.0
+
+    def _show_frame(self):
+        """Sets fleet cars to the states of the current frame"""
+        state = self.frames[int(self.frame)]
+        self.fleet.position[:] = state["position"]
+        self.fleet.angle[:] = state["angle"]
+        self.fleet.velocity[:] = state["velocity"]
+        self.fleet.steering[:] = state["steering"]
+        self.fleet.is_alive[:] = state["is_alive"]
+        self.fleet.score[:] = state["score"]
+
+    def _draw_info(self, speed):
+        """Renders replay information as a text fields"""
+        texts = [
+            f"Generation: {self.generation}",
+            f"Cars: {np.count_nonzero(self.fleet.is_alive)}/{len(self.cars)}",
+            f"Frame: {int(self.frame)}/{len(self.frames) - 1}",
+            f"Speed: {speed:g}x"
+        ]
+
+        label_color = 75, 0, 130
+        for i, text in enumerate(texts[::-1]):
+            label = labels.render(text, 20, label_color)
+            label_rect = label.get_rect()
+            label_rect.center = (120, self.height - 40 - 20 * i)
+            self.screen.blit(label, label_rect)
+
+    def run(self, speed=1.0, fps=60):
+        """Plays recorded frames advancing by speed frames per rendered frame"""
+        paused = False
+        while True:
+            # events binding
+            for event in pg.event.get():
+                if event.type == pg.QUIT:
+                    sys.exit(0)
+                elif event.type == pg.KEYDOWN:
+                    if event.key == pg.K_SPACE:     # pause replay
+                        paused = not paused
+                    elif event.key == pg.K_UP:      # speed up replay
+                        speed *= 2
+                    elif event.key == pg.K_DOWN:    # slow down replay
+                        speed /= 2
+                    elif event.key == pg.K_h:       # restart replay
+                        self.frame = 0.0
+                    elif event.key == pg.K_l:       # show score
+                        for car in self.cars:
+                            car.show_score = False if car.show_score else True
+                    elif event.key == pg.K_ESCAPE:  # exit replay
+                        sys.exit(0)
+
+            # render recorded frame
+            self._show_frame()
+            self.highway.draw(self.screen)
+            for car in self.cars:
+                car.draw(self.screen)
+            self._draw_info(speed)
+            pg.display.flip()
+            self.clock.tick(fps)
+
+            if not paused:
+                self.frame = min(self.frame + speed, len(self.frames) - 1)
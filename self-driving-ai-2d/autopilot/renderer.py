@@ -0,0 +1,64 @@
+import threading
+from autopilot.car import CarFleet, Car
+
+__all__ = "SnapshotBuffer", "SimulationThread"
+
+
+class SnapshotBuffer:
+    """Double buffer of rendered cars states, the simulation publishes into the back and the renderer swaps it in"""
+    FIELDS = (
+        "position", "angle", "velocity", "acceleration", "steering",
+        "is_alive", "score", "progress", "radars", "collision_points"
+    )
+
+    def __init__(self, cars):
+        self.fleet = CarFleet(len(cars), scale=cars[0].scale)
+        self.cars = [Car(fleet=self.fleet, index=i) for i in range(len(cars))]
+        for car, source in zip(self.cars, cars):
+            car.sprite_index = source.sprite_index
+            car.show_collision_points = source.show_collision_points
+            car.show_radars = source.show_radars
+            car.show_score = source.show_score
+
+        self._lock = threading.Lock()
+        self._back = None
+        self.requested = True
+
+    def publish(self, fleet):
+        """Copies states of the rendered cars from the simulation fleet only when the renderer waits for a frame"""
+        if self.requested:
+            snapshot = {field: getattr(fleet, field)[:len(self.cars)].copy() for field in self.FIELDS}
+            with self._lock:
+                self._back, self.requested = snapshot, False
+
+    def swap(self):
+        """Moves the latest published snapshot into the front fleet, returns False if there is no new one"""
+        with self._lock:
+            snapshot, self._back, self.requested = self._back, None, True
+        if snapshot is None:
+            return False
+
+        for field, values in snapshot.items():
+            getattr(self.fleet, field)[:] = values
+        return True
+
+
+class SimulationThread(threading.Thread):
+    """Daemon thread running the simulation loop which re-raises its exception when joined"""
+
+    def __init__(self, target, *args):
+        super().__init__(daemon=True)
+        self._target_loop = target
+        self._target_args = args
+        self.error = None
+
+    def run(self):
+        try:
+            self._target_loop(*self._target_args)
+        except BaseException as error:
+            self.error = error
+
+    def join(self, timeout=None):
+        super().join(timeout)
+        if self.error:
+            raise self.error
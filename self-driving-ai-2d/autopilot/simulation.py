@@ -1,41 +1,92 @@
 import sys
 import neat
 import pickle
+import random
+import threading
 import numpy as np
 import pygame as pg
-from autopilot.highway import Highway
-from autopilot.car import Car
+from autopilot.highway import Highway, HighwayStack
+from autopilot.car import CarFleet, Car
+from autopilot.radars import Radars
+from autopilot.labels import labels
+from autopilot.network import NetworkBatch
+from autopilot.mapbank import MapBank
+from autopilot.parallel import ParallelEvaluator
+from autopilot.recorder import TrajectoryRecorder
+from autopilot.renderer import SnapshotBuffer, SimulationThread
+from autopilot.profiler import PhaseProfiler, NullProfiler
+from autopilot.checkpoint import AsyncCheckpointer
 
 __all__ = "Simulation"
 
 
 class Simulation:
     """Self-driving car training on simulation with the random-generated highway map"""
-    def __init__(self, epochs=10000, map_spread=(150, 350), map_complexity=5, time_per_map=10000):
+    def __init__(self, epochs=10000, map_spread=(150, 350), map_complexity=5, time_per_map=10000,
+                 headless=False, dt=None, seed=None, radars_mode="march",
+                 stall_window=None, stall_progress=5.0, fitness="score", map_bank=None,
+                 maps_per_generation=1, fitness_aggregate="mean", record=None, render_fps=None, profile=None):
+        if fitness not in {"score", "progress"}:
+            raise ValueError(f"Fitness can be computed by either score or progress, got {fitness!r}!")
+        if fitness_aggregate not in {"mean", "min"}:
+            raise ValueError(f"Fitness across maps can be aggregated by either mean or min, got {fitness_aggregate!r}!")
+
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+
         pg.init()
-        pg.display.set_caption("Self-driving simulation")
         self.window = 1320, 768
         self.width, self.height = self.window
-        self.screen = pg.display.set_mode(self.window, pg.FULLSCREEN)
+        self.headless = headless
+        if headless:
+            self.screen = pg.Surface(self.window)
+        else:
+            pg.display.set_caption("Self-driving simulation")
+            self.screen = pg.display.set_mode(self.window, pg.FULLSCREEN)
         self.clock = pg.time.Clock()
+        self.dt = 0.1 if (headless or render_fps) and dt is None else dt
+        self.render_fps = render_fps
 
-        self.highway = Highway((self.width // 2, self.height // 2), map_spread, map_complexity, width=30)
+        # the first highway is rendered, all of them are simulated at once
+        self.highways = HighwayStack([
+            Highway((self.width // 2, self.height // 2), map_spread, map_complexity, width=30, size=self.window,
+                    generate=not map_bank)
+            for _ in range(maps_per_generation)
+        ])
+        self.highway = self.highways[0]
+        self.surface = self.highways if maps_per_generation > 1 else self.highway
+        self.map_bank = MapBank(map_bank) if map_bank else None
+        self.radars = Radars(count=5, mode=radars_mode)
         self.best_score = -float("inf")
         self.time_per_map = time_per_map
+        self.stall_window = stall_window
+        self.stall_progress = stall_progress
+        self.fitness = fitness
+        self.fitness_aggregate = fitness_aggregate
+        self.recorder = TrajectoryRecorder(record) if record else None
+        self.profiler = PhaseProfiler(profile) if profile else NullProfiler()
         self.generations = epochs
         self.generation = 0
         self.map = 0
         self.time = 0
         self.cars_left = 0
+        if self.map_bank:
+            self._load_maps()
+
+    def _get_time_step(self):
+        """Returns the fixed simulation time step or the one measured by the clock"""
+        return self.dt if self.dt is not None else self.clock.get_time() * 0.01
 
     def _draw_info(self, car=None):
-        """Renders training information as a text fields"""
+        """Renders training information as a text fields and returns their screen areas"""
         if car:
             texts = [
                 f"Speed: {round(car.velocity.x, 2)}",
                 f"Boost: {round(car.acceleration, 2)}",
                 f"Rudder: {round(car.steering, 2)}",
-                f"Score: {round(car.score, 2)}"
+                f"Score: {round(car.score, 2)}",
+                f"Progress: {round(car.progress)}/{round(self.highway.highway_length)}"
             ]
         else:
             texts = [
@@ -47,25 +98,108 @@ class Simulation:
             ]
 
         label_color = 75, 0, 130
-        font = pg.font.SysFont("Comic Sans MS", 20)
+        areas = []
         for i, text in enumerate(texts[::-1]):
-            label = font.render(text, True, label_color)
+            label = labels.render(text, 20, label_color)
             label_rect = label.get_rect()
             label_rect.center = (120, self.height - 40 - 20 * i)
-            self.screen.blit(label, label_rect)
+            areas.append(self.screen.blit(label, label_rect))
+
+        if self.profiler.show:
+            areas.append(self.screen.blit(labels.render(self.profiler.summary(), 15, label_color), (10, 10)))
+        return areas
 
     def _init_new_generation(self, genomes, config):
         """Initializes new generation of networks and cars according to genomes"""
-        self.nets, self.cars = [], []
         self.best_score = 0
         self.generation += 1
 
         for _, gen in genomes:
             gen.fitness = 0
-            net = neat.nn.FeedForwardNetwork.create(gen, config)
-            car = Car(spawn_position=self.highway.start_position, spawn_angle=self.highway.start_angle, scale=0.5)
-            self.nets.append(net)
-            self.cars.append(car)
+        self.networks = NetworkBatch.create([gen for _, gen in genomes], config)
+
+        # each genome drives a car on every map, cars of the rendered first map come first
+        maps = np.repeat(np.arange(len(self.highways)), len(genomes))
+        spawn_positions = np.array([highway.start_position for highway in self.highways])[maps]
+        spawn_angles = np.array([highway.start_angle for highway in self.highways])[maps]
+        self.fleet = CarFleet(
+            len(maps), spawn_positions, spawn_angles, 0.5, self.radars,
+            stall_window=self.stall_window, stall_progress=self.stall_progress, maps=maps
+        )
+        self.fleet.profiler = self.profiler
+        self.cars = [Car(fleet=self.fleet, index=i) for i in range(len(genomes))]
+        if self.recorder:
+            sprites = np.tile([car.sprite_index for car in self.cars], len(self.highways))
+            self.recorder.start(self.generation, self.highways, self.fleet, sprites, self.time_per_map - self.time + 3)
+        self.profiler.start(self.generation)
+
+    def _spawn_car(self):
+        """Creates a single car on the highway start position"""
+        fleet = CarFleet(1, self.highway.start_position, self.highway.start_angle, 0.5, self.radars)
+        fleet.profiler = self.profiler
+        return Car(fleet=fleet)
+
+    @staticmethod
+    def _map_movement(outputs):
+        """Maps networks outputs to direction and rotation actions from {-1, 0, 1}"""
+        return np.where(np.abs(outputs) < 0.33, 0, np.sign(outputs)).astype(np.int_)
+
+    def _step_generation(self, genomes):
+        """Moves alive cars of a generation according to their networks and updates genomes fitness"""
+        # get movement params from networks of alive cars
+        fleet = self.fleet
+        alive = np.flatnonzero(fleet.is_alive)
+        inputs = np.c_[fleet.radars_data[alive], fleet.velocity[alive] / fleet.max_velocity]
+        actions = self._map_movement(self.networks.activate(inputs, alive % len(genomes)))
+        self.profiler.lap("activate")
+
+        # move cars
+        fleet.step(actions, self._get_time_step(), self.surface, indices=alive)
+
+        # update cars fitness aggregated across maps
+        scores = (fleet.progress if self.fitness == "progress" else fleet.score).reshape(-1, len(genomes))
+        scores = scores.min(axis=0) if self.fitness_aggregate == "min" else scores.mean(axis=0)
+        for (_, gen), score in zip(genomes, scores):
+            gen.fitness = float(score)
+        self.best_score = max(self.best_score, scores.max())
+        # a genome is still driving while its car on any of the maps is alive
+        self.cars_left = np.count_nonzero(fleet.is_alive.reshape(-1, len(genomes)).any(axis=0))
+        if self.recorder:
+            self.recorder.record(fleet)
+        self.profiler.lap("fitness")
+        self.profiler.frame()
+
+    def _finish_generation(self):
+        """Flushes trajectories and profile of the finished generation"""
+        if self.recorder:
+            self.recorder.flush()
+        self.profiler.save()
+
+    def _load_maps(self):
+        """Loads highways of the current map from the map bank"""
+        for i, highway in enumerate(self.highways):
+            self.map_bank.load(highway, self.map * len(self.highways) + i)
+
+    def _next_map(self):
+        """Switches simulation to new random-generated highways or the next ones from the map bank"""
+        self.map += 1
+        self.time = 0
+        if self.map_bank:
+            self._load_maps()
+        else:
+            for highway in self.highways:
+                highway.generate()
+
+    def evaluate(self, genomes, config):
+        """Simulates a generation on the current highways without rendering until cars crash or time is over"""
+        self._init_new_generation(genomes, config)
+
+        while True:
+            self._step_generation(genomes)
+            if not self.cars_left or self.time > self.time_per_map:
+                break
+            self.time += 1
+        self._finish_generation()
 
     def _run_generation(self, genomes, config):
         """Controls the logic of car training on each generation simulation"""
@@ -73,14 +207,13 @@ class Simulation:
 
         while True:
             # events binding
-            for event in pg.event.get():
+            for event in [] if self.headless else pg.event.get():
                 if event.type == pg.QUIT:
                     sys.exit(0)
                 elif event.type == pg.KEYDOWN:
                     if event.key == pg.K_g:         # generate new highway
-                        self.highway.generate()
-                        self.map += 1
-                        self.time = 0
+                        self._finish_generation()
+                        self._next_map()
                         return
                     elif event.key == pg.K_j:       # show collision points
                         for car in self.cars:
@@ -91,68 +224,147 @@ class Simulation:
                     elif event.key == pg.K_l:       # show score
                         for car in self.cars:
                             car.show_score = False if car.show_score else True
+                    elif event.key == pg.K_p:       # show profile
+                        self.profiler.show = self.profiler.enabled and not self.profiler.show
                     elif event.key == pg.K_ESCAPE:  # exit simulation
                         sys.exit(0)
 
-            # render highway map
-            self.highway.draw(self.screen)
+            self.profiler.lap("events")
 
-            self.cars_left = 0
-            for net, car, gen in zip(self.nets, self.cars, genomes):
-                # get movement params from network
-                output = net.activate(np.append(car.radars_data, car.velocity.x / car.max_velocity))
-
-                # movement params mapping
-                direction, rotation = [0 if -0.33 < out < 0.33 else np.sign(out) for out in output]
-                movement_params = {"direction": direction, "rotation": rotation}
-
-                # move a car
-                t = self.clock.get_time() * 0.01
-                car.move(movement_params, t, self.screen, self.highway)
+            # render highway map
+            if not self.headless:
+                self.highway.draw(self.screen)
+            self.profiler.lap("draw_map")
 
-                # update car fitness
-                self.best_score = max(self.best_score, car.score)
-                gen[1].fitness = car.score
-                self.cars_left += 1 if car.is_alive else 0
+            # move cars and update their fitness
+            self._step_generation(genomes)
 
             # render cars
-            self._draw_info()
-            for car in self.cars:
-                car.draw(self.screen)
+            if not self.headless:
+                self._draw_info()
+                for car in self.cars:
+                    car.draw(self.screen)
+            self.profiler.lap("draw_cars")
 
             # check if cars or time left to continue
             if not self.cars_left:
                 break
             elif self.time > self.time_per_map:
-                self.highway.generate()
-                self.map += 1
-                self.time = 0
+                self._next_map()
                 break
             else:
                 self.time += 1
+                if not self.headless:
+                    pg.display.flip()
+                    self.clock.tick(0)
+                self.profiler.lap("flip")
+        self._finish_generation()
+
+    def _simulate_generation(self, genomes, snapshots, stop):
+        """Moves cars of a generation unthrottled and publishes snapshots until cars crash, time is over or stopped"""
+        while not stop.is_set():
+            self._step_generation(genomes)
+            snapshots.publish(self.fleet)
+            if not self.cars_left or self.time > self.time_per_map:
+                break
+            self.time += 1
+
+    def _run_generation_threaded(self, genomes, config):
+        """Simulates each generation in a background thread while the latest snapshots are rendered at capped FPS"""
+        self._init_new_generation(genomes, config)
+        snapshots = SnapshotBuffer(self.cars)
+        stop = threading.Event()
+        simulation = SimulationThread(self._simulate_generation, genomes, snapshots, stop)
+        simulation.start()
+
+        while simulation.is_alive():
+            # events binding
+            for event in pg.event.get():
+                if event.type == pg.QUIT:
+                    sys.exit(0)
+                elif event.type == pg.KEYDOWN:
+                    if event.key == pg.K_g:         # generate new highway
+                        stop.set()
+                        simulation.join()
+                        self._finish_generation()
+                        self._next_map()
+                        return
+                    elif event.key == pg.K_j:       # show collision points
+                        for car in snapshots.cars:
+                            car.show_collision_points = False if car.show_collision_points else True
+                    elif event.key == pg.K_k:       # show collision radars
+                        for car in snapshots.cars:
+                            car.show_radars = False if car.show_radars else True
+                    elif event.key == pg.K_l:       # show score
+                        for car in snapshots.cars:
+                            car.show_score = False if car.show_score else True
+                    elif event.key == pg.K_p:       # show profile
+                        self.profiler.show = self.profiler.enabled and not self.profiler.show
+                    elif event.key == pg.K_ESCAPE:  # exit simulation
+                        sys.exit(0)
+
+            # render the latest snapshot, intermediate simulation steps are skipped
+            if snapshots.swap():
+                self.highway.draw(self.screen)
+                self._draw_info()
+                for car in snapshots.cars:
+                    car.draw(self.screen)
                 pg.display.flip()
-                self.clock.tick(0)
-
-    def train(self, config_file="autopilot/self-driving.conf"):
-        """Initializes NEAT from config and starts training process on simulation"""
-        config = neat.config.Config(
-            neat.DefaultGenome,
-            neat.DefaultReproduction,
-            neat.DefaultSpeciesSet,
-            neat.DefaultStagnation,
-            config_file
-        )
+            self.clock.tick(self.render_fps)
 
-        population = neat.Population(config)
+        # the highway is switched after the simulation thread stops to not be rendered half-built
+        simulation.join()
+        if self.cars_left and self.time > self.time_per_map:
+            self._next_map()
+        self._finish_generation()
+
+    def train(self, config_file="autopilot/self-driving.conf", workers=1, resume=False,
+              checkpoint_prefix="checkpoints/self-driving-checkpoint-"):
+        """Trains NEAT from config or the latest checkpoint when resuming, None workers use all CPU cores"""
+        if workers != 1 and not self.headless:
+            raise ValueError("Parallel training is only available for the headless simulation!")
+        if workers != 1 and self.recorder:
+            raise ValueError("Trajectories can only be recorded by the serial training!")
+
+        checkpoint = AsyncCheckpointer.latest_checkpoint(checkpoint_prefix) if resume else None
+        if checkpoint:
+            population = AsyncCheckpointer.restore_checkpoint(checkpoint)
+            self.generation = population.generation
+        else:
+            config = neat.config.Config(
+                neat.DefaultGenome,
+                neat.DefaultReproduction,
+                neat.DefaultSpeciesSet,
+                neat.DefaultStagnation,
+                config_file
+            )
+            population = neat.Population(config)
+
+        checkpointer = AsyncCheckpointer(10, filename_prefix=checkpoint_prefix, resume=bool(checkpoint))
+        if checkpoint:
+            # the restored generation is already saved, the next checkpoint is due an interval later
+            checkpointer.last_generation_checkpoint = population.generation
         population.add_reporter(neat.StdOutReporter(True))
         population.add_reporter(neat.StatisticsReporter())
-        population.add_reporter(neat.Checkpointer(10, filename_prefix="checkpoints/self-driving-checkpoint-"))
+        population.add_reporter(checkpointer)
 
-        return population.run(self._run_generation, self.generations)
+        epochs = max(self.generations - self.generation, 0)
+        if workers == 1:
+            threaded = self.render_fps and not self.headless
+            evaluate, evaluator = self._run_generation_threaded if threaded else self._run_generation, None
+        else:
+            evaluator = ParallelEvaluator(self, workers)
+            evaluate = evaluator.evaluate
+        try:
+            return population.run(evaluate, epochs)
+        finally:
+            if evaluator:
+                evaluator.close()
+            checkpointer.close()
 
-    def test(self, genome=None, config_file="autopilot/self-driving.conf"):
-        """Tests simulation environment"""
-        car = Car(self.highway.start_position, self.highway.start_angle, scale=0.5)
+    def test(self, genome=None, config_file="autopilot/self-driving.conf", dirty_rects=True):
+        """Tests simulation environment, dirty rects mode updates only the screen areas changed since the last frame"""
+        car = self._spawn_car()
         if genome:
             config = neat.config.Config(
                 neat.DefaultGenome,
@@ -161,34 +373,43 @@ class Simulation:
                 neat.DefaultStagnation,
                 config_file
             )
-            autopilot = neat.nn.FeedForwardNetwork.create(genome, config)
+            autopilot = NetworkBatch.create([genome], config)
         else:
             autopilot = None
 
+        background, areas = None, None
+        self.profiler.start(0)
         while True:
             # events binding
             for event in pg.event.get():
                 if event.type == pg.QUIT:
+                    self.profiler.save()
                     sys.exit(0)
                 elif event.type == pg.KEYDOWN:
                     if event.key == pg.K_g:         # generate new highway
                         self.highway.generate()
-                        car = Car(self.highway.start_position, self.highway.start_angle, scale=0.5)
+                        car = self._spawn_car()
+                        background = None
                     elif event.key == pg.K_h:       # reset car position
-                        car = Car(self.highway.start_position, self.highway.start_angle, scale=0.5)
+                        car = self._spawn_car()
                     elif event.key == pg.K_j:       # show collision points
                         car.show_collision_points = False if car.show_collision_points else True
                     elif event.key == pg.K_k:       # show collision radars
                         car.show_radars = False if car.show_radars else True
                     elif event.key == pg.K_l:       # show score
                         car.show_score = False if car.show_score else True
+                    elif event.key == pg.K_p:       # show profile
+                        self.profiler.show = self.profiler.enabled and not self.profiler.show
                     elif event.key == pg.K_ESCAPE:  # exit simulation
+                        self.profiler.save()
                         sys.exit(0)
 
+            self.profiler.lap("events")
+
             # keyboard inputs
             if autopilot:
-                output = autopilot.activate(np.append(car.radars_data, car.velocity.x / car.max_velocity))
-                direction, rotation = [0 if -0.33 < out < 0.33 else np.sign(out) for out in output]
+                outputs = autopilot.activate([np.append(car.radars_data, car.velocity.x / car.max_velocity)])
+                direction, rotation = self._map_movement(outputs)[0]
             else:
                 pressed = pg.key.get_pressed()
                 if pressed[pg.K_UP] or pressed[pg.K_w]:
@@ -204,15 +425,31 @@ class Simulation:
                     rotation = "left"
                 else:
                     rotation = "neutral"
+            self.profiler.lap("activate")
+
+            # restore areas under the previous car and info or render the whole highway map
+            if dirty_rects and background is not None:
+                for area in areas:
+                    self.screen.blit(background, area, area)
+            else:
+                self.highway.draw(self.screen)
+                background = self.screen.copy() if dirty_rects else None
+                areas = None
+            self.profiler.lap("draw_map")
 
             # car movement logic
-            self.highway.draw(self.screen)
             movement_params = {"direction": direction, "rotation": rotation}
-            car.move(movement_params, self.clock.get_time() * 0.01, self.screen, self.highway)
-            car.draw(self.screen)
-            self._draw_info(car)
-            pg.display.flip()
+            car.move(movement_params, self._get_time_step(), self.highway)
+            changed = car.draw(self.screen) + self._draw_info(car)
+            self.profiler.lap("draw_cars")
+            if areas is None:
+                pg.display.flip()
+            else:
+                pg.display.update(areas + changed)
+            areas = changed
             self.clock.tick(0)
+            self.profiler.lap("flip")
+            self.profiler.frame()
 
     @staticmethod
     def save(genome):
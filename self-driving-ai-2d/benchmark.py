@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import numpy as np
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import neat
+import pygame as pg
+from autopilot import Highway, CarFleet, Car, Simulation
+from autopilot.radars import Radars
+
+
+def measure(run, repeat, setup=None):
+    """Returns the best time of repeated runs of the benchmark body, setup is run untimed before each of them"""
+    times = []
+    for _ in range(repeat):
+        state = (setup(),) if setup else ()
+        start = time.perf_counter()
+        run(*state)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def create_highway(seed):
+    """Generates the seeded highway all benchmarks run on"""
+    np.random.seed(seed)
+    return Highway((660, 384), (150, 350), 5, width=30, size=(1320, 768))
+
+
+def create_fleet(highway, cars, radars=None):
+    """Spawns cars on the highway start with slightly spread headings to cover different radars hits"""
+    angles = highway.start_angle + np.linspace(-15, 15, cars)
+    return CarFleet(cars, highway.start_position, angles, 0.5, radars)
+
+
+def bench_highway_generate(args):
+    highway = create_highway(args.seed)
+    maps = 5
+
+    def run():
+        np.random.seed(args.seed)
+        for _ in range(maps):
+            highway.generate()
+
+    return maps / measure(run, args.repeat), "maps/s"
+
+
+def bench_highway_draw(args):
+    highway = create_highway(args.seed)
+    screen = pg.Surface(highway.size)
+    highway.draw(screen)
+    elapsed = measure(lambda: [highway.draw(screen) for _ in range(args.frames)], args.repeat)
+    return args.frames / elapsed, "frames/s"
+
+
+def bench_car_move(args):
+    highway = create_highway(args.seed)
+
+    def run():
+        car = Car(highway.start_position, highway.start_angle, 0.5)
+        for _ in range(args.frames):
+            if not car.is_alive:
+                car = Car(highway.start_position, highway.start_angle, 0.5)
+            car.move({"direction": "forward", "rotation": "neutral"}, args.dt, highway)
+
+    return args.frames / measure(run, args.repeat), "steps/s"
+
+
+def bench_fleet_step(args):
+    highway = create_highway(args.seed)
+    actions = np.random.default_rng(args.seed).integers(-1, 2, (args.frames, args.cars, 2))
+
+    def run():
+        fleet = create_fleet(highway, args.cars)
+        for frame_actions in actions:
+            fleet.step(frame_actions, args.dt, highway)
+
+    return args.cars * args.frames / measure(run, args.repeat), "cars*frames/s"
+
+
+def bench_radars(mode):
+    def bench(args):
+        highway = create_highway(args.seed)
+        radars = Radars(count=5, mode=mode)
+        fleet = create_fleet(highway, args.cars, radars)
+        elapsed = measure(
+            lambda: [radars.compute(fleet.position, fleet.angle, fleet.max_radar_len, highway)
+                     for _ in range(args.frames)], args.repeat
+        )
+        return args.cars * args.frames / elapsed, "cars*frames/s"
+    return bench
+
+
+def bench_check_collision(args):
+    highway = create_highway(args.seed)
+    fleet = create_fleet(highway, args.cars)
+    idx = np.arange(args.cars)
+    elapsed = measure(lambda: [fleet._check_collision(idx, highway) for _ in range(args.frames)], args.repeat)
+    return args.cars * args.frames / elapsed, "cars*frames/s"
+
+
+def bench_run_generation(args):
+    config = neat.config.Config(
+        neat.DefaultGenome,
+        neat.DefaultReproduction,
+        neat.DefaultSpeciesSet,
+        neat.DefaultStagnation,
+        "autopilot/self-driving.conf"
+    )
+
+    def setup():
+        sim = Simulation(epochs=args.generations, time_per_map=args.frames, headless=True, seed=args.seed)
+        return sim, neat.Population(config)
+
+    def run(state):
+        sim, population = state
+        population.run(sim._run_generation, args.generations)
+
+    return args.generations * 60 / measure(run, args.repeat, setup), "generations/min"
+
+
+BENCHMARKS = {
+    "highway_generate": bench_highway_generate,
+    "highway_draw": bench_highway_draw,
+    "car_move": bench_car_move,
+    "fleet_step": bench_fleet_step,
+    "radars_march": bench_radars("march"),
+    "radars_trace": bench_radars("trace"),
+    "check_collision": bench_check_collision,
+    "run_generation": bench_run_generation
+}
+
+
+def check_params(results, baseline):
+    """Returns names of the params which make results incomparable with the baseline, repeats don't change the work"""
+    params, baseline_params = results["params"], baseline.get("params", {})
+    return sorted(
+        key for key in params.keys() | baseline_params.keys()
+        if key != "repeat" and params.get(key) != baseline_params.get(key)
+    )
+
+
+def compare(results, baseline, threshold):
+    """Prints throughput changes against the baseline results and returns names of regressed benchmarks"""
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        if name not in baseline["benchmarks"]:
+            continue
+        ratio = result["value"] / baseline["benchmarks"][name]["value"]
+        regressed = ratio < 1 - threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<20} {ratio:>7.2f}x {'REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks hot paths of the self-driving simulation")
+    parser.add_argument("--output", help="JSON file to write results to")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="throughput drop flagged as a regression")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cars", type=int, default=100)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--generations", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dt", type=float, default=0.1)
+    args = parser.parse_args()
+
+    pg.init()
+    results = {
+        "project": "self-driving-ai-2d",
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "params": {key: getattr(args, key) for key in ("seed", "cars", "frames", "generations", "repeat", "dt")},
+        "benchmarks": {}
+    }
+    for name in args.only or BENCHMARKS:
+        random.seed(args.seed)
+        value, unit = BENCHMARKS[name](args)
+        results["benchmarks"][name] = {"value": value, "unit": unit}
+        print(f"{name:<20} {value:>14.1f} {unit}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        mismatched = check_params(results, baseline)
+        if mismatched:
+            sys.exit(f"Results can't be compared, params differ from the baseline: {', '.join(mismatched)}")
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
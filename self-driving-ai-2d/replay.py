@@ -0,0 +1,16 @@
+import argparse
+from autopilot import Replay
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replays a generation recorded by the simulation")
+    parser.add_argument("path", help="recorded generation file, e.g. checkpoints/trajectories/generation-00001.npz")
+    parser.add_argument("--speed", type=float, default=1.0, help="recorded frames played per rendered frame")
+    parser.add_argument("--map", type=int, default=0, help="highway index when several maps were simulated")
+    args = parser.parse_args()
+
+    Replay(args.path, map_index=args.map).run(args.speed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import neat
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_FILE = os.path.join(PROJECT_DIR, "autopilot", "self-driving.conf")
+
+
+@pytest.fixture(autouse=True)
+def project_directory(monkeypatch):
+    # sprites are loaded relative to the project directory like in main.py
+    monkeypatch.chdir(PROJECT_DIR)
+
+
+@pytest.fixture
+def config():
+    return neat.config.Config(
+        neat.DefaultGenome,
+        neat.DefaultReproduction,
+        neat.DefaultSpeciesSet,
+        neat.DefaultStagnation,
+        CONFIG_FILE
+    )
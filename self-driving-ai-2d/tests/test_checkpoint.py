@@ -0,0 +1,62 @@
+import os
+import random
+import neat
+import numpy as np
+from autopilot import Simulation
+from autopilot.checkpoint import AsyncCheckpointer
+
+
+def write(checkpointer, fitness):
+    for generation, value in fitness.items():
+        checkpointer._write(generation, value, b"")
+
+
+def kept(prefix):
+    directory, name = os.path.split(prefix)
+    return sorted(int(path[len(name):]) for path in os.listdir(directory) if path[len(name):].isdigit())
+
+
+def test_retention_keeps_last_and_best(tmp_path):
+    prefix = str(tmp_path / "ck-")
+    write(AsyncCheckpointer(filename_prefix=prefix, keep_last=2, keep_best=1), {0: 1.0, 1: 9.0, 2: 3.0, 3: 2.0, 4: 4.0})
+    assert kept(prefix) == [1, 3, 4]
+
+
+def test_fresh_run_ignores_checkpoints_of_older_runs(tmp_path):
+    prefix = str(tmp_path / "ck-")
+    write(AsyncCheckpointer(filename_prefix=prefix, keep_last=2, keep_best=0), {30: 1.0, 40: 1.0, 50: 1.0})
+    write(AsyncCheckpointer(filename_prefix=prefix, keep_last=2, keep_best=0), {0: 1.0, 10: 1.0})
+    assert kept(prefix) == [0, 10, 40, 50]
+    assert AsyncCheckpointer.latest_checkpoint(prefix) == f"{prefix}10"
+
+    write(AsyncCheckpointer(filename_prefix=prefix, keep_last=2, keep_best=0, resume=True), {20: 1.0})
+    assert kept(prefix) == [10, 20, 40, 50]
+
+
+def test_checkpoint_restores_random_states(tmp_path, config):
+    prefix = str(tmp_path / "ck-")
+    population = neat.Population(config)
+    checkpointer = AsyncCheckpointer(filename_prefix=prefix)
+    np.random.seed(1)
+    random.seed(1)
+    checkpointer.save_checkpoint(config, population.population, population.species, 7)
+    checkpointer.close()
+    expected = np.random.random(), random.random()
+
+    restored = AsyncCheckpointer.restore_checkpoint(f"{prefix}7")
+    assert restored.generation == 7
+    assert (np.random.random(), random.random()) == expected
+    assert neat.Checkpointer.restore_checkpoint(f"{prefix}7").generation == 7
+
+
+def test_resume_continues_without_rewriting_the_restored_checkpoint(tmp_path):
+    prefix = str(tmp_path / "ck-")
+    Simulation(epochs=10, time_per_map=20, headless=True, seed=0).train(checkpoint_prefix=prefix)
+    assert kept(prefix) == [9]
+    mtime = os.stat(f"{prefix}9").st_mtime_ns
+
+    sim = Simulation(epochs=12, time_per_map=20, headless=True, seed=0)
+    sim.train(resume=True, checkpoint_prefix=prefix)
+    assert sim.generation == 12
+    assert kept(prefix) == [9]
+    assert os.stat(f"{prefix}9").st_mtime_ns == mtime
@@ -0,0 +1,39 @@
+import copy
+import neat
+import numpy as np
+import pytest
+from autopilot import Simulation
+
+
+def create_simulation(maps, fitness_aggregate="mean"):
+    return Simulation(time_per_map=100, headless=True, seed=0, fitness="progress",
+                      maps_per_generation=maps, fitness_aggregate=fitness_aggregate)
+
+
+@pytest.mark.parametrize("fitness_aggregate, aggregate", [("mean", np.mean), ("min", np.min)])
+def test_fitness_aggregates_single_map_runs(config, fitness_aggregate, aggregate):
+    genomes = list(neat.Population(config).population.items())
+    sim = create_simulation(2, fitness_aggregate)
+    sim.evaluate(genomes, config)
+
+    per_map = []
+    for highway in sim.highways:
+        single = create_simulation(1)
+        single.highway.build(highway.highway_curve)
+        map_genomes = copy.deepcopy(genomes)
+        single.evaluate(map_genomes, config)
+        per_map.append([gen.fitness for _, gen in map_genomes])
+
+    assert np.allclose([gen.fitness for _, gen in genomes], aggregate(per_map, axis=0))
+
+
+def test_cars_left_counts_genomes(config):
+    genomes = list(neat.Population(config).population.items())
+    sim = create_simulation(3)
+    sim._init_new_generation(genomes, config)
+    sim._step_generation(genomes)
+    assert sim.cars_left == len(genomes)
+
+    sim.fleet.is_alive[:len(genomes)] = False
+    sim._step_generation(genomes)
+    assert sim.cars_left == len(genomes)
@@ -0,0 +1,20 @@
+import random
+import neat
+import numpy as np
+from autopilot.network import NetworkBatch
+
+
+def test_batch_matches_feed_forward_networks(config):
+    random.seed(0)
+    genomes = list(neat.Population(config).population.values())
+    for gen in genomes:
+        for _ in range(30):
+            gen.mutate(config.genome_config)
+
+    batch = NetworkBatch.create(genomes, config)
+    inputs = np.random.default_rng(0).uniform(0, 1, (len(genomes), config.genome_config.num_inputs))
+    expected = [neat.nn.FeedForwardNetwork.create(gen, config).activate(x) for gen, x in zip(genomes, inputs)]
+    assert np.allclose(batch.activate(inputs), expected)
+
+    indices = [3, 0, 7]
+    assert np.allclose(batch.activate(inputs[indices], indices), np.array(expected)[indices])
@@ -0,0 +1,24 @@
+import copy
+import neat
+from autopilot import Simulation
+from autopilot.parallel import ParallelEvaluator
+
+
+def create_simulation():
+    return Simulation(time_per_map=100, headless=True, seed=0, stall_window=30, fitness="progress",
+                      maps_per_generation=2)
+
+
+def test_parallel_fitness_matches_serial(config):
+    genomes = list(neat.Population(config).population.items())
+    parallel_genomes = copy.deepcopy(genomes)
+
+    create_simulation().evaluate(genomes, config)
+    evaluator = ParallelEvaluator(create_simulation(), workers=2)
+    try:
+        evaluator.evaluate(parallel_genomes, config)
+    finally:
+        evaluator.close()
+
+    assert [gen.fitness for _, gen in parallel_genomes] == [gen.fitness for _, gen in genomes]
+    assert len({gen.fitness for _, gen in genomes}) > 1
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from autopilot import Highway, CarFleet
+
+
+@pytest.fixture
+def highway():
+    np.random.seed(0)
+    return Highway((660, 384), (150, 350), 5, width=30, size=(1320, 768))
+
+
+@pytest.mark.parametrize("step", [8, -8])
+def test_progress_follows_arc_length_around_the_loop(highway, step):
+    fleet = CarFleet(1, highway.start_position, highway.start_angle, 0.5)
+    points = len(highway.highway_curve)
+    idx = np.arange(1)
+    for i in 100 + np.arange(0, points + 1, abs(step)) * np.sign(step):
+        fleet.position[0] = highway.highway_curve[i % points]
+        fleet._compute_progress(idx, highway)
+
+    expected = np.sign(step) * highway.progress_direction * highway.highway_length
+    assert fleet.progress[0] == pytest.approx(expected, rel=1e-6)
+
+
+def test_stalled_cars_are_retired(highway):
+    fleet = CarFleet(2, highway.start_position, highway.start_angle, 0.5, stall_window=5, stall_progress=5.0)
+    idx = np.arange(2)
+    for _ in range(5):
+        assert fleet.is_alive.all()
+        fleet.progress[0] += 10
+        fleet._check_stall(idx)
+    assert fleet.is_alive.tolist() == [True, False]
+
+
+def test_standing_cars_are_retired_after_the_stall_window(highway):
+    fleet = CarFleet(3, highway.start_position, highway.start_angle, 0.5, stall_window=20)
+    for _ in range(20):
+        fleet.step(np.zeros((3, 2)), 0.1, highway)
+    assert not fleet.is_alive.any()
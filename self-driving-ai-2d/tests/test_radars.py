@@ -0,0 +1,27 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pytest
+from autopilot import Highway
+from autopilot.radars import Radars
+
+
+def create_highway(seed):
+    np.random.seed(seed)
+    return Highway((660, 384), (150, 350), 5, width=30, size=(1320, 768))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_trace_matches_march(seed):
+    highway = create_highway(seed)
+    rng = np.random.default_rng(seed)
+    road = np.argwhere(highway.mask == highway.ROAD)
+    positions = road[rng.choice(len(road), 200)].astype(np.float64)
+    angles = rng.uniform(0, 360, len(positions))
+    max_length = 150
+
+    marched, _ = Radars(count=5, mode="march").compute(positions, angles, max_length, highway)
+    traced, _ = Radars(count=5, mode="trace").compute(positions, angles, max_length, highway)
+    assert np.abs(traced - marched).max() * max_length <= 1
@@ -1,4 +1,5 @@
 from autopilot.parking import SmallParking, LargeParking
 from autopilot.car import Car
 from autopilot.simulation import Simulation
-__all__ = "SmallParking", "LargeParking", "Car", "Simulation"
+from autopilot.env import VecEnv, SubprocVecEnv
+__all__ = "SmallParking", "LargeParking", "Car", "Simulation", "VecEnv", "SubprocVecEnv"
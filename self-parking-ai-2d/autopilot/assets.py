@@ -0,0 +1,87 @@
+import os
+import numpy as np
+import pygame as pg
+
+__all__ = "AssetCache", "assets"
+
+
+class AssetCache:
+    """Process-wide images loaded once from the sprites directory or a packed asset file with their
+    scaled and rotated variants"""
+
+    def __init__(self, directory="autopilot/sprites"):
+        self.directory = directory
+        self.images = {}
+        self.variants = {}
+        self.packs = set()
+        self.converted = False
+
+    def __len__(self):
+        return len(self.images)
+
+    @staticmethod
+    def _convert(image):
+        """Converts image to the display pixel format for fast blitting when the display mode is set"""
+        if not pg.display.get_surface():
+            return image
+        return image.convert_alpha() if image.get_flags() & pg.SRCALPHA else image.convert()
+
+    def _sync_display(self):
+        """Converts the images loaded before the display mode was set once it is, their variants are made again"""
+        if not self.converted and pg.display.get_surface():
+            self.images = {name: self._convert(image) for name, image in self.images.items()}
+            self.variants.clear()
+            self.converted = True
+
+    def get(self, name):
+        """Returns the image by its file name without extension, it is read from disk only once"""
+        self._sync_display()
+        if name not in self.images:
+            self.images[name] = self._convert(pg.image.load(os.path.join(self.directory, f"{name}.png")))
+        return self.images[name]
+
+    def scaled(self, name, scale):
+        """Returns the image scaled to the given scale"""
+        self._sync_display()
+        key = name, "scaled", scale
+        if key not in self.variants:
+            image = self.get(name)
+            size = round(image.get_width() * scale), round(image.get_height() * scale)
+            self.variants[key] = pg.transform.scale(image, size)
+        return self.variants[key]
+
+    def rotated(self, name, angle):
+        """Returns the image rotated by the angle"""
+        self._sync_display()
+        key = name, "rotated", angle
+        if key not in self.variants:
+            self.variants[key] = pg.transform.rotate(self.get(name), angle)
+        return self.variants[key]
+
+    def pack(self, path):
+        """Writes all images of the sprites directory into a single file of raw RGB or RGBA pixels"""
+        names = sorted(file[:-4] for file in os.listdir(self.directory) if file.endswith(".png"))
+        pixels = {}
+        for name in names:
+            image = pg.image.load(os.path.join(self.directory, f"{name}.png"))
+            mode = "RGBA" if image.get_flags() & pg.SRCALPHA else "RGB"
+            data = np.frombuffer(pg.image.tostring(image, mode), np.uint8)
+            pixels[name] = data.reshape(image.get_height(), image.get_width(), len(mode))
+        np.savez(path, **pixels)
+
+    def load(self, path):
+        """Fills the cache with all images of a packed asset file at once, a loaded file is not read again"""
+        self._sync_display()
+        if path in self.packs:
+            return
+        with np.load(path) as pack:
+            for name in pack.files:
+                pixels = pack[name]
+                height, width, channels = pixels.shape
+                image = pg.image.fromstring(pixels.tobytes(), (width, height), "RGBA" if channels == 4 else "RGB")
+                self.images[name] = self._convert(image)
+        self.variants.clear()
+        self.packs.add(path)
+
+
+assets = AssetCache()
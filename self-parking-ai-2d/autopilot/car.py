@@ -2,19 +2,21 @@ import pygame as pg
 import numpy as np
 from pygame.math import Vector2
 from math import sqrt, sin, cos, atan2, radians, degrees, copysign
+from autopilot.labels import labels
+from autopilot.assets import assets
+from autopilot.profiler import NullProfiler
 
 __all__ = "Car"
 
 
 class Car:
     """Kinematic model of a car with radars for calculating distances to objects"""
+    profiler = NullProfiler()
 
     def __init__(self, spawn_position=(0.0, 0.0), spawn_angle=0, scale=1,
                  show_collision=False, show_radars=False, show_score=False):
-        sprite = pg.image.load(f"autopilot/sprites/car0.png")
-        rect = sprite.get_rect()
-        w, h = round(rect.width * scale), round(rect.height * scale)
-        self.car_sprite = pg.transform.scale(sprite, (w, h))
+        self.car_sprite = assets.scaled("car0", scale)
+        w, h = self.car_sprite.get_size()
         self.car_sprite_width = 0.5 * w - 5
         self.car_sprite_height = 0.5 * h - 10
         self.chassis_length = 0.03 * h
@@ -122,41 +124,20 @@ class Car:
 
         self.collision_points = new_points
 
-    def _check_collision(self, screen, surface):
-        """Checks for collisions and reduces score for collisions with obstacles"""
-        for point in self.collision_points:
-            if not self._safe_position(point, screen, surface):
-                self.movement_score -= 10
-                self._stop()
-                break
+    def _check_collision(self, surface):
+        """Checks for collisions of the car body and reduces score for collisions with obstacles"""
+        half_size = self.car_sprite_width, self.car_sprite_height
+        if surface.obstacles.collides(self.position, radians(-self.angle), half_size):
+            self.movement_score -= 10
+            self._stop()
 
-    def _compute_radars(self, screen, surface):
+    def _compute_radars(self, surface):
         """Calculates radars and distances from car to surface facilities"""
-        car_angles = np.array([radians(90 - self.angle - 45 * angle) for angle in range(8)])
-        self.radars = np.empty((0, 2), np.int_)
-        self.radars_data = np.empty(0, np.single)
-        length, x, y = 0, 0, 0
-
-        for angle in car_angles:
-            for length in range(1, self.max_radar_len + 1):
-                x = int(self.position.x + length * cos(angle))
-                y = int(self.position.y + length * sin(angle))
-                if not self._safe_position((x, y), screen, surface):
-                    break
-            self.radars = np.append(self.radars, [(x, y)], axis=0)
-            self.radars_data = np.append(self.radars_data, length / self.max_radar_len)
-
-    def _safe_position(self, position, screen, surface, *, limit=60):
-        """Checks that the color on surface matches the colors allowed for safe driving"""
-        try:
-            color = screen.get_at(position)
-            return any([
-                self._compute_distance(color, surface.road_color) < limit,
-                self._compute_distance(color, surface.pointers_color) < limit,
-                self._compute_distance(color, surface.road_pointers_color) < limit
-            ])
-        except IndexError:
-            return False
+        car_angles = [radians(90 - self.angle - 45 * angle) for angle in range(8)]
+        directions = np.array([(cos(angle), sin(angle)) for angle in car_angles])
+        lengths = surface.obstacles.raycast(self.position, directions, self.max_radar_len)
+        self.radars = (np.array(self.position) + directions * lengths[:, None]).astype(np.int_)
+        self.radars_data = lengths / self.max_radar_len
 
     @staticmethod
     def _compute_distance(*points):
@@ -164,8 +145,11 @@ class Car:
         return sqrt(sum(map(lambda a, b: (a - b) ** 2, *points)))
 
     def _compute_target_distance(self, surface):
-        """Calculates distance ratio depending on the proximity to the target"""
-        distance = self._compute_distance(self.position, surface.target_position)
+        """Calculates distance ratio depending on the proximity to the target along the path around obstacles"""
+        # the coarse grid distances are only accurate to a couple of cells, close to the target the straight one wins
+        field = surface.distance_field
+        straight = self._compute_distance(self.position, surface.target_position)
+        distance = max(straight, field.distance(self.position) - 2 * field.cell)
         if not self.start_distance:
             self.start_distance = distance
         ratio = -distance / self.start_distance + 1
@@ -186,6 +170,12 @@ class Car:
         spot_x, spot_y = surface.target_position
         spot_vector = self.position.x - spot_x, self.position.y - spot_y
 
+        # the path around obstacles bends away from the straight line, it follows the distance field gradient
+        field = surface.distance_field
+        straight = self._compute_distance(self.position, surface.target_position)
+        if field.distance(self.position) > straight + 2 * field.cell:
+            spot_vector = field.direction(self.position)
+
         bumper_x = self.collision_points[:2, 0].mean()
         bumper_y = self.collision_points[:2, 1].mean()
         car_vector = self.position.x - bumper_x, self.position.y - bumper_y
@@ -208,40 +198,53 @@ class Car:
 
         self.navigation = np.array([forward, backward, right, left, self.target_distance])
 
-    def move(self, movement, dt, screen, surface):
+    def sense(self, surface):
+        """Calculates collision points, radars and navigation of a standing car without charging score"""
+        self._compute_collision_points()
+        self._compute_radars(surface)
+        self._compute_target_distance(surface)
+        self._navigate_target(surface)
+
+    def move(self, movement, dt, surface):
         """Moves a car model according to the kinematics laws and the input direction"""
         if self.is_alive:
             self._update(movement, dt)
+            self.profiler.lap("update")
             self._compute_collision_points()
-            self._check_collision(screen, surface)
-            self._compute_radars(screen, surface)
+            self._check_collision(surface)
+            self.profiler.lap("collision")
+            self._compute_radars(surface)
+            self.profiler.lap("radars")
             self._compute_target_distance(surface)
             self._navigate_target(surface)
+            self.profiler.lap("navigation")
             self._compute_score()
+            self.profiler.lap("score")
 
     def draw(self, screen):
-        """Renders a car model with radars and collision points"""
+        """Renders a car model with radars and collision points and returns the screen areas it covers"""
+        areas = []
         if self.is_alive and self.show_radars:
             for coord in self.radars:
-                pg.draw.aaline(screen, (255, 140, 0), self.position, coord, 1)
-                pg.draw.circle(screen, (255, 140, 0), coord, 5)
+                areas.append(pg.draw.aaline(screen, (255, 140, 0), self.position, coord, 1))
+                areas.append(pg.draw.circle(screen, (255, 140, 0), coord, 5))
 
         if self.show_collision_points:
             for coord in self.collision_points:
                 if self.is_alive:
-                    pg.draw.circle(screen, (15, 192, 252), coord, 5)
+                    areas.append(pg.draw.circle(screen, (15, 192, 252), coord, 5))
                 elif self.parked:
-                    pg.draw.circle(screen, (0, 255, 0), coord, 5)
+                    areas.append(pg.draw.circle(screen, (0, 255, 0), coord, 5))
                 else:
-                    pg.draw.circle(screen, (255, 0, 0), coord, 5)
+                    areas.append(pg.draw.circle(screen, (255, 0, 0), coord, 5))
 
         rotated = pg.transform.rotate(self.car_sprite, self.angle)
         rect = rotated.get_rect()
-        screen.blit(rotated, self.position - Vector2(rect.width / 2, rect.height / 2))
+        areas.append(screen.blit(rotated, self.position - Vector2(rect.width / 2, rect.height / 2)))
 
         if self.show_score:
-            font = pg.font.SysFont("Comic Sans MS", int(20 * self.scale))
-            label = font.render(str(round(self.score)), True, (0, 0, 0))
+            label = labels.render(str(round(self.score)), int(20 * self.scale), (0, 0, 0))
             label_rect = label.get_rect()
             label_rect.center = self.position
-            screen.blit(label, label_rect)
+            areas.append(screen.blit(label, label_rect))
+        return areas
@@ -0,0 +1,197 @@
+import os
+import random
+import numpy as np
+import multiprocessing as mp
+from autopilot.car import Car
+from autopilot.assets import assets
+from autopilot.parking import SmallParking, LargeParking
+
+__all__ = "VecEnv", "SubprocVecEnv"
+
+
+class VecEnv:
+    """Batch of independent headless cars on parking lots with a gym-style vectorized reset and step API"""
+    OBSERVATION_SIZE, ACTION_SIZE = 13, 2
+    PARKINGS = {"small": SmallParking, "large": LargeParking}
+
+    def __init__(self, num_envs, parking="small", maps=1, parked_cars=None, time_limit=1000, dt=0.1,
+                 assets_pack=None):
+        if parking not in self.PARKINGS:
+            raise ValueError(f"Unknown parking {parking!r}, expected one of: {', '.join(self.PARKINGS)}!")
+        if assets_pack is not None:
+            assets.load(assets_pack)
+
+        # environment i parks on the parking lot i modulo maps, collisions are checked against its obstacles
+        self.num_envs = num_envs
+        self.parkings = [self.PARKINGS[parking](spawn_cars=parked_cars) for _ in range(maps)]
+        self.cars = []
+        self.time_limit = time_limit
+        self.dt = dt
+        self.time = np.zeros(num_envs, np.int_)
+
+        # buffers are reused by every step, copy them to keep the values
+        self.observations = np.zeros((num_envs, self.OBSERVATION_SIZE), np.float32)
+        self.rewards = np.zeros(num_envs, np.float32)
+        self.dones = np.zeros(num_envs, np.bool_)
+
+    def __len__(self):
+        return self.num_envs
+
+    def _get_map(self, i):
+        """Returns the parking lot of the environment"""
+        return self.parkings[i % len(self.parkings)]
+
+    def _respawn(self, i):
+        """Restarts the environment with a car on the start position of its parking lot"""
+        parking = self._get_map(i)
+        car = Car(parking.start_position, parking.start_angle)
+        car.sense(parking)
+        self.cars[i] = car
+        self.time[i] = 0
+
+    def _observe(self, i):
+        """Fills the observation buffer row with radars data and navigation, the same inputs as networks get"""
+        car = self.cars[i]
+        self.observations[i] = np.concatenate((car.radars_data, car.navigation))
+
+    def reset(self, seed=None):
+        """Shuffles parked cars and targets of all parking lots and restarts all environments"""
+        if seed is not None:
+            random.seed(seed)
+        for parking in self.parkings:
+            parking.randomize()
+
+        self.cars = [None] * self.num_envs
+        for i in range(self.num_envs):
+            self._respawn(i)
+            self._observe(i)
+        return self.observations
+
+    def step(self, actions):
+        """Moves cars by (num_envs, 2) direction and rotation actions and restarts finished environments
+
+        Actions are thresholded the same way as network outputs, so both {-1, 0, 1} and continuous values work.
+        Infos of finished environments hold the terminal observation, final score and parking result.
+        """
+        actions = np.asarray(actions, np.float64).reshape(self.num_envs, self.ACTION_SIZE)
+        actions = np.where(np.abs(actions) < 0.33, 0, np.sign(actions)).astype(np.int_)
+        self.time += 1
+
+        infos = [{} for _ in range(self.num_envs)]
+        for i, (car, (direction, rotation)) in enumerate(zip(self.cars, actions)):
+            score = car.score
+            car.move({"direction": int(direction), "rotation": int(rotation)}, self.dt, self._get_map(i))
+            self.rewards[i] = car.score - score
+            self.dones[i] = not car.is_alive or self.time[i] >= self.time_limit
+            self._observe(i)
+
+            if self.dones[i]:
+                infos[i] = {
+                    "terminal_observation": self.observations[i].copy(),
+                    "score": car.score,
+                    "parked": car.parked,
+                    "TimeLimit.truncated": car.is_alive
+                }
+                self._respawn(i)
+                self._observe(i)
+
+        return self.observations, self.rewards, self.dones, infos
+
+    def close(self):
+        """Releases environments resources, nothing to release in process"""
+
+
+def _shared_array(shape, dtype):
+    """Allocates a lock-free shared memory buffer for a numpy array"""
+    return mp.RawArray("b", int(np.prod(shape)) * np.dtype(dtype).itemsize)
+
+
+def _view(buffer, shape, dtype):
+    """Wraps a shared memory buffer into a numpy array without copying"""
+    return np.frombuffer(buffer, dtype).reshape(shape)
+
+
+def _run_worker(connection, buffers, offset, num_envs, settings):
+    """Steps a slice of environments in a subprocess exchanging data through shared memory buffers"""
+    observations, actions, rewards, dones = [
+        _view(buffer, shape, dtype)[offset:offset + num_envs] for buffer, shape, dtype in buffers
+    ]
+    # forked workers inherit the parent random state and would shuffle the same parking lots
+    random.seed()
+    env = VecEnv(num_envs, **settings)
+
+    while True:
+        command, seed = connection.recv()
+        if command == "step":
+            observations[:], rewards[:], dones[:], infos = env.step(actions)
+            connection.send({i: info for i, info in enumerate(infos) if info})
+        elif command == "reset":
+            observations[:] = env.reset(seed)
+            connection.send(None)
+        elif command == "close":
+            env.close()
+            connection.close()
+            break
+
+
+class SubprocVecEnv:
+    """Environments split across worker processes sharing observation, action, reward and done buffers"""
+    OBSERVATION_SIZE, ACTION_SIZE = VecEnv.OBSERVATION_SIZE, VecEnv.ACTION_SIZE
+
+    def __init__(self, num_envs, workers=None, **settings):
+        self.num_envs = num_envs
+        workers = min(workers or os.cpu_count(), num_envs)
+
+        buffers = [
+            ((num_envs, self.OBSERVATION_SIZE), np.float32),
+            ((num_envs, self.ACTION_SIZE), np.float64),
+            ((num_envs,), np.float32),
+            ((num_envs,), np.bool_)
+        ]
+        buffers = [(_shared_array(shape, dtype), shape, dtype) for shape, dtype in buffers]
+        self.observations, self.actions, self.rewards, self.dones = [_view(*buffer) for buffer in buffers]
+
+        chunks = np.array_split(np.arange(num_envs), workers)
+        self.offsets = [chunk[0] for chunk in chunks]
+        self.connections, self.processes = [], []
+        for chunk in chunks:
+            parent, child = mp.Pipe()
+            process = mp.Process(
+                target=_run_worker, args=(child, buffers, chunk[0], len(chunk), settings), daemon=True
+            )
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def __len__(self):
+        return self.num_envs
+
+    def reset(self, seed=None):
+        """Restarts all environments, each worker gets its own seed derived from the given one"""
+        for i, connection in enumerate(self.connections):
+            connection.send(("reset", None if seed is None else seed + i))
+        for connection in self.connections:
+            connection.recv()
+        return self.observations
+
+    def step(self, actions):
+        """Moves cars in all workers at once, only infos of finished environments are sent through pipes"""
+        self.actions[:] = np.asarray(actions, np.float64).reshape(self.num_envs, self.ACTION_SIZE)
+        for connection in self.connections:
+            connection.send(("step", None))
+
+        infos = [{} for _ in range(self.num_envs)]
+        for offset, connection in zip(self.offsets, self.connections):
+            for i, info in connection.recv().items():
+                infos[offset + i] = info
+
+        return self.observations, self.rewards, self.dones, infos
+
+    def close(self):
+        """Stops worker processes"""
+        for connection in self.connections:
+            connection.send(("close", None))
+            connection.close()
+        for process in self.processes:
+            process.join()
@@ -0,0 +1,62 @@
+import numpy as np
+from math import sqrt
+
+__all__ = "GeodesicField"
+
+
+class GeodesicField:
+    """Shortest path distances to the target through free space on a coarse grid of cells around obstacles"""
+    NEIGHBOURS = [(dx, dy, sqrt(dx * dx + dy * dy)) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+
+    def __init__(self, obstacles, target, cell=8):
+        self.cell = cell
+        self.shape = -(-obstacles.size[0] // cell), -(-obstacles.size[1] // cell)
+
+        # cells overlapped by any obstacle are blocked
+        self.free = np.ones(self.shape, np.bool_)
+        for x0, y0, x1, y1 in obstacles.rects:
+            cx0, cy0 = max(int(x0 // cell), 0), max(int(y0 // cell), 0)
+            self.free[cx0:int(-(-x1 // cell)), cy0:int(-(-y1 // cell))] = False
+
+        self.values = self._propagate(self._cell(target))
+        self.gradient = np.stack(np.gradient(self.values), axis=-1)
+
+    def _cell(self, position):
+        """Returns the grid cell of the position clipped to the grid"""
+        return (min(max(int(position[0] // self.cell), 0), self.shape[0] - 1),
+                min(max(int(position[1] // self.cell), 0), self.shape[1] - 1))
+
+    def _propagate(self, target):
+        """Expands the wavefront from the target cell until distances stop changing, blocked cells get
+        distances from their free neighbours but do not pass them on"""
+        values = np.full(self.shape, np.inf)
+        values[target] = 0
+        padded = np.full((self.shape[0] + 2, self.shape[1] + 2), np.inf)
+        while True:
+            padded[1:-1, 1:-1] = np.where(self.free, values, np.inf)
+            padded[1 + target[0], 1 + target[1]] = 0
+            relaxed = values.copy()
+            for dx, dy, step in self.NEIGHBOURS:
+                shifted = padded[1 + dx:padded.shape[0] - 1 + dx, 1 + dy:padded.shape[1] - 1 + dy]
+                np.minimum(relaxed, shifted + step, out=relaxed)
+            if np.array_equal(relaxed, values):
+                break
+            values = relaxed
+
+        # cells which the wavefront can't reach are as far as the farthest reached one
+        reached = np.isfinite(values)
+        values[~reached] = values[reached].max()
+        return values * self.cell
+
+    def distance(self, position):
+        """Returns the distance from the position to the target through free space interpolated between cells"""
+        x = min(max(position[0] / self.cell - 0.5, 0), self.shape[0] - 1)
+        y = min(max(position[1] / self.cell - 0.5, 0), self.shape[1] - 1)
+        x0, y0 = min(int(x), self.shape[0] - 2), min(int(y), self.shape[1] - 2)
+        fx, fy = x - x0, y - y0
+        (v00, v01), (v10, v11) = self.values[x0:x0 + 2, y0:y0 + 2]
+        return (v00 * (1 - fy) + v01 * fy) * (1 - fx) + (v10 * (1 - fy) + v11 * fy) * fx
+
+    def direction(self, position):
+        """Returns the gradient of distances at the cell of the position pointing away from the target"""
+        return self.gradient[self._cell(position)]
@@ -0,0 +1,98 @@
+import numpy as np
+from math import sin, cos
+
+__all__ = "Obstacles", "grid_rectangles"
+
+
+def grid_rectangles(grid):
+    """Decomposes a boolean occupancy grid indexed by (x, y) into (n, 4) rectangles of x0, y0, x1, y1"""
+    rects, spans = [], {}
+    for y in range(grid.shape[1] + 1):
+        row = np.zeros(grid.shape[0] + 2, np.int8)
+        if y < grid.shape[1]:
+            row[1:-1] = grid[:, y]
+        edges = np.flatnonzero(np.diff(row))
+        runs = set(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+        # runs with the same span as in the previous row extend its rectangles downwards
+        for (x0, x1), y0 in spans.items():
+            if (x0, x1) not in runs:
+                rects.append((x0, y0, x1, y))
+        spans = {run: spans.get(run, y) for run in runs}
+    return np.array(rects, np.float64).reshape(-1, 4)
+
+
+class Obstacles:
+    """Axis-aligned rectangular obstacles in a uniform grid of cells for ray casts and oriented box collisions"""
+
+    def __init__(self, rects, size=(1320, 768), cell=128):
+        self.rects = np.asarray(rects, np.float64).reshape(-1, 4)
+        self.size = size
+        self.cell = cell
+
+        # cells mark the rectangles overlapping them, queries only test rectangles of the covered cells
+        self.shape = columns, rows = -(-size[0] // cell), -(-size[1] // cell)
+        x0, x1 = [np.clip(self.rects[:, i] // cell, 0, columns - 1) for i in (0, 2)]
+        y0, y1 = [np.clip(self.rects[:, i] // cell, 0, rows - 1) for i in (1, 3)]
+        cx, cy = np.indices(self.shape)[..., None]
+        self.cells = (x0 <= cx) & (cx <= x1) & (y0 <= cy) & (cy <= y1)
+
+    def query(self, x0, y0, x1, y1):
+        """Returns rectangles overlapping the box"""
+        columns, rows = self.shape
+        cx0, cx1 = [min(max(int(x // self.cell), 0), columns - 1) for x in (x0, x1)]
+        cy0, cy1 = [min(max(int(y // self.cell), 0), rows - 1) for y in (y0, y1)]
+        return self.rects[self.cells[cx0:cx1 + 1, cy0:cy1 + 1].any(axis=(0, 1))]
+
+    def raycast(self, origin, directions, max_length):
+        """Returns distances along unit directions from the origin to the first obstacle or the area border,
+        rays start inside the area and their distances are limited by the max length"""
+        ox, oy = origin
+        directions = np.asarray(directions, np.float64)
+        dx, dy = directions.T
+        dx = np.where(np.abs(dx) < 1e-12, 1e-12, dx)
+        dy = np.where(np.abs(dy) < 1e-12, 1e-12, dy)
+
+        # the area border is left where the first axis runs out of it
+        width, height = self.size
+        exit_x = np.where(dx > 0, (width - ox) / dx, -ox / dx)
+        exit_y = np.where(dy > 0, (height - oy) / dy, -oy / dy)
+        distances = np.minimum(np.minimum(exit_x, exit_y), max_length).clip(0)
+
+        rects = self.query(ox - max_length, oy - max_length, ox + max_length, oy + max_length)
+        if len(rects):
+            # slab intersection of every ray with every rectangle
+            tx0, tx1 = (rects[:, 0] - ox) / dx[:, None], (rects[:, 2] - ox) / dx[:, None]
+            ty0, ty1 = (rects[:, 1] - oy) / dy[:, None], (rects[:, 3] - oy) / dy[:, None]
+            near = np.maximum(np.minimum(tx0, tx1), np.minimum(ty0, ty1)).clip(0)
+            far = np.minimum(np.maximum(tx0, tx1), np.maximum(ty0, ty1))
+            hits = np.where(far >= near, near, np.inf)
+            distances = np.minimum(distances, hits.min(axis=1))
+        return distances
+
+    def collides(self, center, angle, half_size):
+        """Checks if the box rotated by the angle in radians overlaps any obstacle or leaves the area,
+        using the separating axis test against the axes of both boxes"""
+        cx, cy = center
+        hw, hh = half_size
+        ux, uy = cos(angle), sin(angle)
+        cos_a, sin_a = abs(ux), abs(uy)
+
+        # the bounding box of the rotated box is also the test against the area border
+        ex, ey = hw * cos_a + hh * sin_a, hw * sin_a + hh * cos_a
+        width, height = self.size
+        if cx - ex < 0 or cy - ey < 0 or cx + ex > width or cy + ey > height:
+            return True
+
+        rects = self.query(cx - ex, cy - ey, cx + ex, cy + ey)
+        if not len(rects):
+            return False
+        rx, ry = (rects[:, 0] + rects[:, 2]) / 2 - cx, (rects[:, 1] + rects[:, 3]) / 2 - cy
+        rw, rh = (rects[:, 2] - rects[:, 0]) / 2, (rects[:, 3] - rects[:, 1]) / 2
+        separated = (
+            (np.abs(rx) >= rw + ex)
+            | (np.abs(ry) >= rh + ey)
+            | (np.abs(rx * ux + ry * uy) >= hw + rw * cos_a + rh * sin_a)
+            | (np.abs(ry * ux - rx * uy) >= hh + rw * sin_a + rh * cos_a)
+        )
+        return not separated.all()
@@ -1,12 +1,40 @@
+import numpy as np
 import pygame as pg
 from random import randint, shuffle
+from autopilot.assets import assets
+from autopilot.obstacles import Obstacles, grid_rectangles
+from autopilot.geodesic import GeodesicField
 
 __all__ = "SmallParking", "LargeParking"
 
 
+def pixel_occupancy(parking, surface, limit=60):
+	"""Marks pixels of a rendered parking lot which are not of the road colors as occupied, indexed as [x, y]"""
+	pixels = pg.surfarray.array3d(surface).astype(np.int_)
+	occupied = np.ones(pixels.shape[:2], np.bool_)
+	for color in parking.road_color, parking.pointers_color, parking.road_pointers_color:
+		occupied &= ((pixels - color[:3]) ** 2).sum(axis=2) >= limit ** 2
+	return occupied
+
+
+def static_rectangles(parking):
+	"""Renders the static parking lot off-screen and decomposes its occupied pixels into obstacle rectangles"""
+	canvas = pg.Surface(parking.background.get_size())
+	parking.draw_static(canvas)
+	return grid_rectangles(pixel_occupancy(parking, canvas))
+
+
+def car_rectangle(place, car):
+	"""Returns the rectangle of the opaque part of a car sprite parked on a parking space"""
+	x, y = SmallParking.get_center(place, car)
+	rect = car.get_bounding_rect()
+	return x + rect.left, y + rect.top, x + rect.right, y + rect.bottom
+
+
 class SmallParking:
 	"""Small parking lot with parking places and parked cars"""
 	CAPACITY = 54
+	static_rects = None
 
 	def __init__(self, spawn_cars=None):
 		if spawn_cars is None:
@@ -16,7 +44,7 @@ class SmallParking:
 		else:
 			raise ValueError(f"There are only {self.CAPACITY-1}+1 parking places in the parking lot!")
 
-		self.background = pg.image.load("autopilot/sprites/small-parking.png")
+		self.background = assets.get("small-parking")
 		self.grass_color = 63, 155, 11, 255
 		self.markup_color = 255, 255, 255, 255
 		self.road_color = 80, 80, 80, 255
@@ -28,6 +56,10 @@ class SmallParking:
 		self.parked_idxs = []
 		self.target_idx = None
 		self.target_position = None
+		self.cars_rects = None
+		self.obstacles = None
+		self.distance_field = None
+		self.composite = None
 		self.start_angle = 0
 		self.start_position = 660, 384
 
@@ -55,8 +87,12 @@ class SmallParking:
 			else:
 				angle = 0
 
-			sprite = pg.image.load("autopilot/sprites/car" + str(i + 1) + ".png")
-			self.cars_sprites.append(pg.transform.rotate(sprite, angle))
+			self.cars_sprites.append(assets.rotated("car" + str(i + 1), angle))
+
+		# init obstacles of the static parking lot shared by all lots of the class and parked cars
+		if self.static_rects is None:
+			type(self).static_rects = static_rectangles(self)
+		self.cars_rects = np.array([car_rectangle(self.spaces[i], car) for i, car in enumerate(self.cars_sprites)])
 
 		# init parked cars and target space
 		self.randomize()
@@ -71,25 +107,44 @@ class SmallParking:
 		self.target_position = x + w / 2, y + h / 2
 		self.start_angle = randint(0, 360)
 		self.start_position = randint(396, 924), randint(230, 538)
+		rects = np.concatenate((self.static_rects, self.cars_rects[self.parked_idxs]))
+		self.obstacles = Obstacles(rects, self.background.get_size())
+		self.distance_field = GeodesicField(self.obstacles, self.target_position)
+		self.composite = None
 
 	@staticmethod
 	def get_center(place, car):
 		"""Returns the center of a parking space relative to the car sprite"""
 		return place[0] + place[2] / 2 - car.get_size()[0] / 2, place[1] + place[3] / 2 - car.get_size()[1] / 2
 
+	def draw_static(self, screen):
+		"""Renders the parking lot without parked cars and target space"""
+		screen.blit(self.background, (0, 0))
+
+	def render(self):
+		"""Returns the parking lot with target space and parked cars composited once after each shuffle"""
+		if self.composite is None:
+			composite = pg.Surface(self.background.get_size())
+			self.draw_static(composite)
+			pg.draw.rect(composite, self.pointers_color, self.spaces[self.target_idx], 5)
+			for i in self.parked_idxs:
+				pos = self.spaces[i]
+				car = self.cars_sprites[i]
+				composite.blit(car, self.get_center(pos, car))
+
+			# pixel format conversion is only possible when the display mode is set
+			self.composite = composite.convert() if pg.display.get_surface() else composite
+		return self.composite
+
 	def draw(self, screen):
 		"""Renders parked cars and target space"""
-		screen.blit(self.background, (0, 0))
-		pg.draw.rect(screen, self.pointers_color, self.spaces[self.target_idx], 5)
-		for i in self.parked_idxs:
-			pos = self.spaces[i]
-			car = self.cars_sprites[i]
-			screen.blit(car, self.get_center(pos, car))
+		screen.blit(self.render(), (0, 0))
 
 
 class LargeParking:
 	"""Large parking lot with parking places and parked cars"""
 	CAPACITY = 64
+	static_rects = None
 
 	def __init__(self, spawn_cars=None):
 		if spawn_cars is None:
@@ -99,7 +154,7 @@ class LargeParking:
 		else:
 			raise ValueError(f"There are only {self.CAPACITY - 1}+1 parking places in the parking lot!")
 
-		self.background = pg.image.load("autopilot/sprites/large-parking.png")
+		self.background = assets.get("large-parking")
 		self.grass_color = 63, 155, 11, 255
 		self.markup_color = 255, 255, 255, 255
 		self.road_color = 80, 80, 80, 255
@@ -111,6 +166,10 @@ class LargeParking:
 		self.parked_idxs = []
 		self.target_idx = None
 		self.target_position = None
+		self.cars_rects = None
+		self.obstacles = None
+		self.distance_field = None
+		self.composite = None
 		self.start_angle = 0
 		self.start_position = 100, 580
 		self._init_parking()
@@ -139,8 +198,12 @@ class LargeParking:
 			else:
 				angle = 0
 
-			sprite = pg.image.load("autopilot/sprites/car" + str(i + 1) + ".png")
-			self.cars_sprites.append(pg.transform.rotate(sprite, angle))
+			self.cars_sprites.append(assets.rotated("car" + str(i + 1), angle))
+
+		# init obstacles of the static parking lot shared by all lots of the class and parked cars
+		if self.static_rects is None:
+			type(self).static_rects = static_rectangles(self)
+		self.cars_rects = np.array([car_rectangle(self.spaces[i], car) for i, car in enumerate(self.cars_sprites)])
 
 		# init parked cars and target space
 		self.randomize()
@@ -153,19 +216,37 @@ class LargeParking:
 		self.parked_idxs = random_spaces[:self.cars_num]
 		x, y, w, h = self.spaces[self.target_idx]
 		self.target_position = x + w / 2, y + h / 2
+		rects = np.concatenate((self.static_rects, self.cars_rects[self.parked_idxs]))
+		self.obstacles = Obstacles(rects, self.background.get_size())
+		self.distance_field = GeodesicField(self.obstacles, self.target_position)
+		self.composite = None
 
 	@staticmethod
 	def get_center(place, car):
 		"""Returns the center of a parking space relative to the car sprite"""
 		return place[0] + place[2] / 2 - car.get_size()[0] / 2, place[1] + place[3] / 2 - car.get_size()[1] / 2
 
-	def draw(self, screen):
-		"""Renders parked cars and target space"""
+	def draw_static(self, screen):
+		"""Renders the parking lot with the closed entrance lane without parked cars and target space"""
 		screen.blit(self.background, (0, 0))
 		pg.draw.rect(screen, self.grass_color, (20, 20, 160, 481), 0)
 		pg.draw.rect(screen, self.markup_color, (20, 20, 160, 481), 5)
-		pg.draw.rect(screen, self.pointers_color, self.spaces[self.target_idx], 5)
-		for i in self.parked_idxs:
-			pos = self.spaces[i]
-			car = self.cars_sprites[i]
-			screen.blit(car, self.get_center(pos, car))
+
+	def render(self):
+		"""Returns the parking lot with target space and parked cars composited once after each shuffle"""
+		if self.composite is None:
+			composite = pg.Surface(self.background.get_size())
+			self.draw_static(composite)
+			pg.draw.rect(composite, self.pointers_color, self.spaces[self.target_idx], 5)
+			for i in self.parked_idxs:
+				pos = self.spaces[i]
+				car = self.cars_sprites[i]
+				composite.blit(car, self.get_center(pos, car))
+
+			# pixel format conversion is only possible when the display mode is set
+			self.composite = composite.convert() if pg.display.get_surface() else composite
+		return self.composite
+
+	def draw(self, screen):
+		"""Renders parked cars and target space"""
+		screen.blit(self.render(), (0, 0))
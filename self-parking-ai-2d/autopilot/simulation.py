@@ -1,25 +1,40 @@
 import sys
 import neat
 import pickle
+import random
 import numpy as np
 import pygame as pg
 from autopilot.car import Car
 from autopilot.parking import SmallParking
+from autopilot.labels import labels
+from autopilot.profiler import PhaseProfiler, NullProfiler
+from autopilot.checkpoint import AsyncCheckpointer
 
 __all__ = "Simulation"
 
 
 class Simulation:
     """Self-driving car training on simulation with the random-generated parking map"""
-    def __init__(self, epochs=10000, parked_cars=None, time_per_map=1000):
+    def __init__(self, epochs=10000, parked_cars=None, time_per_map=1000, headless=False, dt=None, seed=None,
+                 profile=None):
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+
         pg.init()
-        pg.display.set_caption('Self-parking simulation')
         self.window = 1320, 768
         self.width, self.height = self.window
-        self.screen = pg.display.set_mode(self.window, pg.FULLSCREEN)
+        self.headless = headless
+        if headless:
+            self.screen = pg.Surface(self.window)
+        else:
+            pg.display.set_caption('Self-parking simulation')
+            self.screen = pg.display.set_mode(self.window, pg.FULLSCREEN)
         self.clock = pg.time.Clock()
+        self.dt = 0.1 if headless and dt is None else dt
 
         self.parking = SmallParking(spawn_cars=parked_cars)
+        self.profiler = PhaseProfiler(profile) if profile else NullProfiler()
         self.best_score = -float("inf")
         self.time_per_map = time_per_map
         self.generations = epochs
@@ -28,8 +43,12 @@ class Simulation:
         self.time = 0
         self.cars_left = 0
 
+    def _get_time_step(self):
+        """Returns the fixed simulation time step or the one measured by the clock"""
+        return self.dt if self.dt is not None else self.clock.get_time() * 0.01
+
     def _draw_info(self, car=None):
-        """Renders training information as a text fields"""
+        """Renders training information as a text fields and returns their screen areas"""
         if car:
             texts = [
                 f"Speed: {round(car.velocity.x, 2)}",
@@ -48,12 +67,16 @@ class Simulation:
             ]
 
         label_color = 75, 0, 130
-        font = pg.font.SysFont("Comic Sans MS", 15)
+        areas = []
         for i, text in enumerate(texts[::-1]):
-            label = font.render(text, True, label_color)
+            label = labels.render(text, 15, label_color)
             label_rect = label.get_rect()
             label_rect.center = (1260, self.height - 25 - 15 * i)
-            self.screen.blit(label, label_rect)
+            areas.append(self.screen.blit(label, label_rect))
+
+        if self.profiler.show:
+            areas.append(self.screen.blit(labels.render(self.profiler.summary(), 15, label_color), (10, 10)))
+        return areas
 
     def _init_new_generation(self, genomes, config):
         """Initializes new generation of networks and cars according to genomes"""
@@ -64,9 +87,16 @@ class Simulation:
         for _, gen in genomes:
             gen.fitness = 0
             net = neat.nn.FeedForwardNetwork.create(gen, config)
-            car = Car(self.parking.start_position, self.parking.start_angle)
+            car = self._spawn_car()
             self.nets.append(net)
             self.cars.append(car)
+        self.profiler.start(self.generation)
+
+    def _spawn_car(self):
+        """Creates a single car on the parking start position"""
+        car = Car(self.parking.start_position, self.parking.start_angle)
+        car.profiler = self.profiler
+        return car
 
     def _run_generation(self, genomes, config):
         """Controls the logic of car training on each generation simulation"""
@@ -74,7 +104,7 @@ class Simulation:
 
         while True:
             # events binding
-            for event in pg.event.get():
+            for event in [] if self.headless else pg.event.get():
                 if event.type == pg.QUIT:
                     sys.exit(0)
                 elif event.type == pg.KEYDOWN:
@@ -82,6 +112,7 @@ class Simulation:
                         self.parking.randomize()
                         self.map += 1
                         self.time = 0
+                        self.profiler.save()
                         return
                     elif event.key == pg.K_j:       # show collision points
                         for car in self.cars:
@@ -92,13 +123,20 @@ class Simulation:
                     elif event.key == pg.K_l:       # show score
                         for car in self.cars:
                             car.show_score = False if car.show_score else True
+                    elif event.key == pg.K_p:       # show profile
+                        self.profiler.show = self.profiler.enabled and not self.profiler.show
                     elif event.key == pg.K_ESCAPE:  # exit simulation
                         sys.exit(0)
 
-            # render parking map
-            self.parking.draw(self.screen)
+            self.profiler.lap("events")
+
+            # render parking map, cars sense its obstacles geometry so headless training skips it
+            if not self.headless:
+                self.parking.draw(self.screen)
+            self.profiler.lap("draw_map")
 
             self.cars_left = 0
+            dt = self._get_time_step()
             for net, car, gen in zip(self.nets, self.cars, genomes):
                 # get movement params from network
                 inputs = np.concatenate((car.radars_data, car.navigation))
@@ -107,20 +145,23 @@ class Simulation:
                 # movement params mapping
                 direction, rotation = [0 if -0.33 < out < 0.33 else np.sign(out) for out in outputs]
                 movement_params = {"direction": direction, "rotation": rotation}
+                self.profiler.lap("activate")
 
                 # move a car
-                t = self.clock.get_time() * 0.01
-                car.move(movement_params, t, self.screen, self.parking)
+                car.move(movement_params, dt, self.parking)
 
                 # update car fitness
                 self.best_score = max(self.best_score, car.score)
                 gen[1].fitness = car.score
                 self.cars_left += 1 if car.is_alive else 0
+                self.profiler.lap("fitness")
 
             # render cars
-            self._draw_info()
-            for car in self.cars:
-                car.draw(self.screen)
+            if not self.headless:
+                self._draw_info()
+                for car in self.cars:
+                    car.draw(self.screen)
+            self.profiler.lap("draw_cars")
 
             # check if cars or time left to continue
             if not self.cars_left:
@@ -132,29 +173,46 @@ class Simulation:
                 break
             else:
                 self.time += 1
-                pg.display.flip()
-                self.clock.tick(0)
-
-    def train(self, config_file="autopilot/self-parking.conf"):
-        """Initializes NEAT from config and starts training process on simulation"""
-        config = neat.config.Config(
-            neat.DefaultGenome,
-            neat.DefaultReproduction,
-            neat.DefaultSpeciesSet,
-            neat.DefaultStagnation,
-            config_file
-        )
-
-        population = neat.Population(config)
+                if not self.headless:
+                    pg.display.flip()
+                    self.clock.tick(0)
+                self.profiler.lap("flip")
+                self.profiler.frame()
+        self.profiler.save()
+
+    def train(self, config_file="autopilot/self-parking.conf", resume=False,
+              checkpoint_prefix="checkpoints/self-parking-checkpoint-"):
+        """Trains NEAT from config or the latest checkpoint when resuming"""
+        checkpoint = AsyncCheckpointer.latest_checkpoint(checkpoint_prefix) if resume else None
+        if checkpoint:
+            population = AsyncCheckpointer.restore_checkpoint(checkpoint)
+            self.generation = population.generation
+        else:
+            config = neat.config.Config(
+                neat.DefaultGenome,
+                neat.DefaultReproduction,
+                neat.DefaultSpeciesSet,
+                neat.DefaultStagnation,
+                config_file
+            )
+            population = neat.Population(config)
+
+        checkpointer = AsyncCheckpointer(10, filename_prefix=checkpoint_prefix, resume=bool(checkpoint))
+        if checkpoint:
+            # the restored generation is already saved, the next checkpoint is due an interval later
+            checkpointer.last_generation_checkpoint = population.generation
         population.add_reporter(neat.StdOutReporter(True))
         population.add_reporter(neat.StatisticsReporter())
-        population.add_reporter(neat.Checkpointer(10, filename_prefix="checkpoints/self-parking-checkpoint-"))
+        population.add_reporter(checkpointer)
 
-        return population.run(self._run_generation, self.generations)
+        try:
+            return population.run(self._run_generation, max(self.generations - self.generation, 0))
+        finally:
+            checkpointer.close()
 
-    def test(self, genome=None, config_file="autopilot/self-parking.conf"):
-        """Tests simulation environment"""
-        car = Car(self.parking.start_position, self.parking.start_angle)
+    def test(self, genome=None, config_file="autopilot/self-parking.conf", dirty_rects=True):
+        """Tests simulation environment, dirty rects mode updates only the screen areas changed since the last frame"""
+        car = self._spawn_car()
         if genome:
             config = neat.config.Config(
                 neat.DefaultGenome,
@@ -167,26 +225,35 @@ class Simulation:
         else:
             autopilot = None
 
+        background, areas = None, None
+        self.profiler.start(0)
         while True:
             # events
             for event in pg.event.get():
                 if event.type == pg.QUIT:
+                    self.profiler.save()
                     sys.exit(0)
                 elif event.type == pg.KEYDOWN:
                     if event.key == pg.K_g:         # shuffle parked cars
                         self.parking.randomize()
-                        car = Car(self.parking.start_position, self.parking.start_angle)
+                        car = self._spawn_car()
+                        background = None
                     elif event.key == pg.K_h:       # reset car position
-                        car = Car(self.parking.start_position, self.parking.start_angle)
+                        car = self._spawn_car()
                     elif event.key == pg.K_j:       # show collision points
                         car.show_collision_points = False if car.show_collision_points else True
                     elif event.key == pg.K_k:       # show collision radars
                         car.show_radars = False if car.show_radars else True
                     elif event.key == pg.K_l:       # show score
                         car.show_score = False if car.show_score else True
+                    elif event.key == pg.K_p:       # show profile
+                        self.profiler.show = self.profiler.enabled and not self.profiler.show
                     elif event.key == pg.K_ESCAPE:  # exit simulation
+                        self.profiler.save()
                         sys.exit(0)
 
+            self.profiler.lap("events")
+
             # keyboard inputs
             if autopilot:
                 output = autopilot.activate(np.append(car.radars_data, car.velocity.x / car.max_velocity))
@@ -206,15 +273,31 @@ class Simulation:
                     rotation = "left"
                 else:
                     rotation = "neutral"
+            self.profiler.lap("activate")
+
+            # restore areas under the previous car and info or render the whole parking map
+            if dirty_rects and background is not None:
+                for area in areas:
+                    self.screen.blit(background, area, area)
+            else:
+                self.parking.draw(self.screen)
+                background = self.parking.render() if dirty_rects else None
+                areas = None
+            self.profiler.lap("draw_map")
 
             # car movement logic
-            self.parking.draw(self.screen)
             movement_params = {"direction": direction, "rotation": rotation}
-            car.move(movement_params, self.clock.get_time() * 0.01, self.screen, self.parking)
-            car.draw(self.screen)
-            self._draw_info(car)
-            pg.display.flip()
+            car.move(movement_params, self._get_time_step(), self.parking)
+            changed = car.draw(self.screen) + self._draw_info(car)
+            self.profiler.lap("draw_cars")
+            if areas is None:
+                pg.display.flip()
+            else:
+                pg.display.update(areas + changed)
+            areas = changed
             self.clock.tick(0)
+            self.profiler.lap("flip")
+            self.profiler.frame()
 
     @staticmethod
     def save(genome):
@@ -0,0 +1,195 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import numpy as np
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import neat
+import pygame as pg
+from autopilot import SmallParking, LargeParking, Car, Simulation
+
+PARKINGS = {"small": SmallParking, "large": LargeParking}
+
+
+def measure(run, repeat, setup=None):
+    """Returns the best time of repeated runs of the benchmark body, setup is run untimed before each of them"""
+    times = []
+    for _ in range(repeat):
+        state = (setup(),) if setup else ()
+        start = time.perf_counter()
+        run(*state)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def create_parking(args):
+    """Creates the seeded parking lot all benchmarks run on"""
+    random.seed(args.seed)
+    return PARKINGS[args.parking](spawn_cars=args.parked_cars)
+
+
+def create_cars(parking, cars):
+    """Spawns cars on the parking start with slightly spread headings to cover different radars hits"""
+    angles = parking.start_angle + np.linspace(-15, 15, cars)
+    return [Car(parking.start_position, angle) for angle in angles]
+
+
+def bench_parking_randomize(args):
+    parking = create_parking(args)
+
+    def run():
+        random.seed(args.seed)
+        for _ in range(args.frames):
+            parking.randomize()
+
+    return args.frames / measure(run, args.repeat), "maps/s"
+
+
+def bench_parking_draw(args):
+    parking = create_parking(args)
+    screen = pg.Surface((1320, 768))
+    elapsed = measure(lambda: [parking.draw(screen) for _ in range(args.frames)], args.repeat)
+    return args.frames / elapsed, "frames/s"
+
+
+def bench_car_move(args):
+    parking = create_parking(args)
+    actions = np.random.default_rng(args.seed).integers(-1, 2, (args.frames, args.cars, 2))
+
+    def run():
+        cars = create_cars(parking, args.cars)
+        for frame_actions in actions:
+            for car, (direction, rotation) in zip(cars, frame_actions):
+                car.move({"direction": direction, "rotation": rotation}, args.dt, parking)
+
+    return args.cars * args.frames / measure(run, args.repeat), "cars*frames/s"
+
+
+def bench_compute_radars(args):
+    parking = create_parking(args)
+    cars = create_cars(parking, args.cars)
+    elapsed = measure(
+        lambda: [car._compute_radars(parking) for _ in range(args.frames) for car in cars], args.repeat
+    )
+    return args.cars * args.frames / elapsed, "cars*frames/s"
+
+
+def bench_check_collision(args):
+    parking = create_parking(args)
+    cars = create_cars(parking, args.cars)
+    for car in cars:
+        car._compute_collision_points()
+    elapsed = measure(
+        lambda: [car._check_collision(parking) for _ in range(args.frames) for car in cars], args.repeat
+    )
+    return args.cars * args.frames / elapsed, "cars*frames/s"
+
+
+def bench_run_generation(args):
+    config = neat.config.Config(
+        neat.DefaultGenome,
+        neat.DefaultReproduction,
+        neat.DefaultSpeciesSet,
+        neat.DefaultStagnation,
+        "autopilot/self-parking.conf"
+    )
+
+    def setup():
+        sim = Simulation(
+            epochs=args.generations, parked_cars=args.parked_cars, time_per_map=args.frames,
+            headless=True, dt=args.dt, seed=args.seed
+        )
+        return sim, neat.Population(config)
+
+    def run(state):
+        sim, population = state
+        population.run(sim._run_generation, args.generations)
+
+    return args.generations * 60 / measure(run, args.repeat, setup), "generations/min"
+
+
+BENCHMARKS = {
+    "parking_randomize": bench_parking_randomize,
+    "parking_draw": bench_parking_draw,
+    "car_move": bench_car_move,
+    "compute_radars": bench_compute_radars,
+    "check_collision": bench_check_collision,
+    "run_generation": bench_run_generation
+}
+
+
+def check_params(results, baseline):
+    """Returns names of the params which make results incomparable with the baseline, repeats don't change the work"""
+    params, baseline_params = results["params"], baseline.get("params", {})
+    return sorted(
+        key for key in params.keys() | baseline_params.keys()
+        if key != "repeat" and params.get(key) != baseline_params.get(key)
+    )
+
+
+def compare(results, baseline, threshold):
+    """Prints throughput changes against the baseline results and returns names of regressed benchmarks"""
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        if name not in baseline["benchmarks"]:
+            continue
+        ratio = result["value"] / baseline["benchmarks"][name]["value"]
+        regressed = ratio < 1 - threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<20} {ratio:>7.2f}x {'REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks hot paths of the self-parking simulation")
+    parser.add_argument("--output", help="JSON file to write results to")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="throughput drop flagged as a regression")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--parking", choices=list(PARKINGS), default="small")
+    parser.add_argument("--parked-cars", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cars", type=int, default=5)
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--generations", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dt", type=float, default=0.1)
+    args = parser.parse_args()
+
+    pg.init()
+    params = "parking", "parked_cars", "seed", "cars", "frames", "generations", "repeat", "dt"
+    results = {
+        "project": "self-parking-ai-2d",
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "params": {key: getattr(args, key) for key in params},
+        "benchmarks": {}
+    }
+    for name in args.only or BENCHMARKS:
+        random.seed(args.seed)
+        value, unit = BENCHMARKS[name](args)
+        results["benchmarks"][name] = {"value": value, "unit": unit}
+        print(f"{name:<20} {value:>14.1f} {unit}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        mismatched = check_params(results, baseline)
+        if mismatched:
+            sys.exit(f"Results can't be compared, params differ from the baseline: {', '.join(mismatched)}")
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,13 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def project_directory(monkeypatch):
+    # images are loaded relative to the project directory like in main.py
+    monkeypatch.chdir(PROJECT_DIR)
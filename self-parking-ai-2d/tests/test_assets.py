@@ -0,0 +1,19 @@
+import pygame as pg
+from autopilot.assets import AssetCache
+
+
+def test_images_loaded_before_display_are_converted_once_it_is_set():
+    cache = AssetCache()
+    image, rotated = cache.get("car0"), cache.rotated("car0", 90)
+    assert cache.get("car0") is image
+
+    pg.display.init()
+    try:
+        display = pg.display.set_mode((64, 64))
+        converted = cache.get("car0")
+        assert converted is not image
+        assert converted.get_bitsize() == display.get_bitsize()
+        assert cache.rotated("car0", 90) is not rotated
+        assert cache.get("car0") is converted
+    finally:
+        pg.display.quit()
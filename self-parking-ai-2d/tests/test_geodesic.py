@@ -0,0 +1,48 @@
+import random
+import numpy as np
+import pytest
+from autopilot.obstacles import Obstacles
+from autopilot.geodesic import GeodesicField
+from autopilot.parking import SmallParking, LargeParking
+
+
+def test_open_area_distance_follows_straight_line():
+    field = GeodesicField(Obstacles([], (400, 200)), (100, 100))
+    for point in [(300, 100), (100, 180), (380, 20)]:
+        straight = np.hypot(point[0] - 100, point[1] - 100)
+        # diagonal moves between cells overestimate straight lines by at most 8%
+        assert straight - field.cell <= field.distance(point) <= 1.09 * straight + field.cell
+
+
+def test_distance_goes_around_a_wall():
+    field = GeodesicField(Obstacles([(190, 0, 210, 160)], (400, 200)), (100, 20))
+    around = 2 * np.hypot(100, 160)
+    assert around - 2 * field.cell <= field.distance((300, 20)) <= 1.09 * around + 2 * field.cell
+
+
+def test_enclosed_cells_are_farthest():
+    walls = [(200, 40, 300, 50), (200, 150, 300, 160), (200, 40, 210, 160), (290, 40, 300, 160)]
+    field = GeodesicField(Obstacles(walls, (400, 200)), (50, 100))
+    assert np.isfinite(field.values).all()
+    assert field.distance((250, 100)) == pytest.approx(field.values.max())
+    assert field.distance((350, 100)) < field.values.max()
+
+
+@pytest.mark.parametrize("parking_class", [SmallParking, LargeParking])
+def test_target_is_reached_from_the_start_by_descending_distances(parking_class):
+    random.seed(0)
+    parking = parking_class(30)
+    for _ in range(5):
+        parking.randomize()
+        field = parking.distance_field
+        target = field._cell(parking.target_position)
+        x, y = field._cell(parking.start_position)
+        for _ in range(field.values.size):
+            if (x, y) == target:
+                break
+            neighbours = [
+                (x + dx, y + dy) for dx, dy, _ in field.NEIGHBOURS
+                if 0 <= x + dx < field.shape[0] and 0 <= y + dy < field.shape[1] and field.free[x + dx, y + dy]
+            ]
+            x, y = min(neighbours, key=lambda cell: field.values[cell])
+        assert (x, y) == target
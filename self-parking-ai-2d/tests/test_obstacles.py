@@ -0,0 +1,42 @@
+import random
+import numpy as np
+import pytest
+from autopilot.parking import SmallParking, LargeParking, pixel_occupancy
+
+
+def march(occupied, origin, directions, max_length):
+    """Walks rays pixel by pixel like the former sensing and returns the first occupied sample"""
+    lengths = np.arange(1, max_length + 1)
+    points = (origin + lengths[:, None, None] * directions).astype(np.int_)
+    width, height = occupied.shape
+    inside = (points[..., 0] >= 0) & (points[..., 0] < width) & (points[..., 1] >= 0) & (points[..., 1] < height)
+    hits = ~inside | occupied[points[..., 0].clip(0, width - 1), points[..., 1].clip(0, height - 1)]
+    return np.where(hits.any(axis=0), hits.argmax(axis=0) + 1, max_length)
+
+
+def compare_radars(parking, rays=300, max_length=300):
+    occupied = pixel_occupancy(parking, parking.render())
+    rng = np.random.default_rng(0)
+    free = np.argwhere(~occupied)
+    differences = []
+    for origin in free[rng.choice(len(free), rays)] + 0.5:
+        angles = rng.uniform(0, 2 * np.pi, 8)
+        directions = np.stack((np.cos(angles), np.sin(angles)), axis=1)
+        analytic = parking.obstacles.raycast(origin, directions, max_length)
+        differences.append(analytic - march(occupied, origin, directions, max_length))
+    return np.concatenate(differences)
+
+
+@pytest.mark.parametrize("parking_class", [SmallParking, LargeParking])
+def test_static_lot_radars_match_pixels(parking_class):
+    random.seed(0)
+    differences = compare_radars(parking_class(0))
+    # analytic rays also stop at thin markings the pixel walk steps over diagonally
+    assert differences.max() <= 1.5
+    assert np.mean(np.abs(differences) <= 1.5) >= 0.98
+
+
+@pytest.mark.parametrize("parking_class", [SmallParking, LargeParking])
+def test_parked_cars_only_shorten_radars(parking_class):
+    random.seed(0)
+    assert compare_radars(parking_class(30)).max() <= 1.5